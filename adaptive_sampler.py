@@ -0,0 +1,227 @@
+from typing import Callable, List, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+# Доля бюджета точек на начальную равномерную сетку
+INITIAL_FRACTION = 0.25
+# Отклонение середины от хорды (в долях масштаба y), ниже которого не уточняем
+CURVATURE_TOLERANCE = 1e-3
+# Скачок (в долях масштаба y), который проверяется как возможный разрыв
+JUMP_THRESHOLD = 0.05
+# Во сколько раз |y| у разрыва должен превышать масштаб, чтобы считаться полюсом
+POLE_RATIO = 1e3
+BISECTION_STEPS = 40
+MAX_ROUNDS = 16
+MAX_EDGES = 64
+
+
+class Sampling(NamedTuple):
+    """Результат адаптивной выборки: общая сетка x и по строке y на функцию"""
+    x: np.ndarray
+    y: np.ndarray
+    breaks: List[List[float]]
+    poles: List[float]
+    uniform_y: np.ndarray
+
+
+Function = Callable[[np.ndarray], np.ndarray]
+
+
+def _evaluate_one(func: Function, x: np.ndarray) -> np.ndarray:
+    with np.errstate(all='ignore'):
+        y = np.asarray(func(x))
+    if np.iscomplexobj(y):
+        y = np.where(np.abs(y.imag) < 1e-12, y.real, np.nan)
+    return np.array(np.broadcast_to(y, x.shape), dtype=float)
+
+
+def _evaluate(funcs: Sequence[Function], x: np.ndarray) -> np.ndarray:
+    """Значения всех функций на общей сетке: массив (функции × точки)"""
+    return np.vstack([_evaluate_one(func, x) for func in funcs])
+
+
+def _scale(y: np.ndarray) -> np.ndarray:
+    """Устойчивый к выбросам масштаб значений каждой строки (размах между 10% и 90%)"""
+    scale = np.ones(y.shape[0])
+    for row, values in enumerate(y):
+        finite = values[np.isfinite(values)]
+        if finite.size:
+            low, high = np.percentile(finite, [10, 90])
+            scale[row] = float(high - low) or float(np.abs(finite).max()) or 1.0
+    return scale
+
+
+def _refine(funcs, x: np.ndarray, y: np.ndarray, budget: int, scale: np.ndarray,
+            min_width: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Добавляет середины интервалов там, где кривизна или скачок велики.
+
+    Сетка общая для всех функций: интервал делится, если хотя бы одна из
+    них на нём заметно отклоняется от хорды.
+    """
+    for _ in range(MAX_ROUNDS):
+        remaining = budget - x.size
+        if remaining <= 0:
+            break
+
+        finite = np.isfinite(y)
+        with np.errstate(all='ignore'):
+            t = (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+            chord = y[:, :-2] + (y[:, 2:] - y[:, :-2]) * t
+            deviation = np.abs(y[:, 1:-1] - chord) / scale[:, None]
+
+        deviation[~(finite[:, :-2] & finite[:, 1:-1] & finite[:, 2:])] = 0
+        deviation = deviation.max(axis=0)
+        score = np.zeros(x.size - 1)
+        score[:-1] = deviation
+        score[1:] = np.maximum(score[1:], deviation)
+        score[(x[1:] - x[:-1]) < min_width] = 0
+
+        candidates = np.flatnonzero(score > CURVATURE_TOLERANCE)
+        if candidates.size == 0:
+            break
+        if candidates.size > remaining:
+            candidates = candidates[np.argsort(score[candidates])[-remaining:]]
+
+        new_x = (x[candidates] + x[candidates + 1]) / 2
+        new_y = _evaluate(funcs, new_x)
+        order = np.argsort(np.concatenate([x, new_x]), kind='stable')
+        x = np.concatenate([x, new_x])[order]
+        y = np.concatenate([y, new_y], axis=1)[:, order]
+
+    return x, y
+
+
+def _bisect(funcs, rows: np.ndarray, low: np.ndarray, high: np.ndarray,
+            y_low: np.ndarray, y_high: np.ndarray):
+    """Сужает интервалы к точке разрыва или к границе области определения.
+
+    На каждом шаге остаётся та половина, где переход между конечным и
+    неконечным значением или где больший скачок |Δy|. Все интервалы
+    обрабатываются одновременно; rows — номер функции для каждого интервала.
+    """
+    for _ in range(BISECTION_STEPS):
+        mid = (low + high) / 2
+        y_mid = np.empty_like(mid)
+        for row in np.unique(rows):
+            selected = rows == row
+            y_mid[selected] = _evaluate_one(funcs[row], mid[selected])
+
+        with np.errstate(all='ignore'):
+            left_jump = np.abs(y_mid - y_low)
+            right_jump = np.abs(y_high - y_mid)
+        left_jump = np.where(np.isfinite(y_mid) == np.isfinite(y_low), np.nan_to_num(left_jump), np.inf)
+        right_jump = np.where(np.isfinite(y_mid) == np.isfinite(y_high), np.nan_to_num(right_jump), np.inf)
+
+        go_left = left_jump >= right_jump
+        # Интервал сжат до соседних чисел с плавающей точкой — дальше не делим
+        stuck = (mid <= low) | (mid >= high)
+        go_left &= ~stuck
+        go_right = ~go_left & ~stuck
+        high = np.where(go_left, mid, high)
+        y_high = np.where(go_left, y_mid, y_high)
+        low = np.where(go_right, mid, low)
+        y_low = np.where(go_right, y_mid, y_low)
+
+    return low, high, y_low, y_high
+
+
+def sample(funcs: Union[Function, Sequence[Function]], x_min: float, x_max: float,
+           budget: int = 1000) -> Sampling:
+    """Адаптивно выбирает точки графика на [x_min, x_max] в пределах бюджета.
+
+    Несколько функций выбираются вместе на одной сетке. Начальная
+    равномерная сетка уточняется там, где кривая заметно отклоняется от
+    хорды. Затем интервалы со скачком значения или с переходом в
+    неопределённость сужаются бисекцией: если скачок не исчезает, это разрыв
+    (полюс, если |y| неограниченно растёт), а переход к NaN — граница
+    области определения, до которой доводится линия.
+    """
+    if callable(funcs):
+        funcs = [funcs]
+
+    initial = max(16, int(budget * INITIAL_FRACTION))
+    x = np.linspace(x_min, x_max, initial)
+    y = _evaluate(funcs, x)
+    uniform_y = y.copy()
+    scale = _scale(y)
+
+    x, y = _refine(funcs, x, y, budget, scale, (x_max - x_min) / (budget * 16))
+
+    finite = np.isfinite(y)
+    with np.errstate(all='ignore'):
+        jump = np.abs(np.diff(y, axis=1))
+    edge = finite[:, :-1] != finite[:, 1:]
+    steep = finite[:, :-1] & finite[:, 1:] & (jump > JUMP_THRESHOLD * scale[:, None])
+
+    rows, candidates = np.nonzero(edge | steep)
+    if candidates.size > MAX_EDGES * len(funcs):
+        priority = np.where(edge, np.inf, jump)[rows, candidates]
+        keep = np.argsort(priority)[-MAX_EDGES * len(funcs):]
+        rows, candidates = rows[keep], candidates[keep]
+
+    breaks = [[] for _ in funcs]
+    poles = []
+    extra_x = []
+
+    if candidates.size:
+        low, high, y_low, y_high = _bisect(
+            funcs, rows, x[candidates], x[candidates + 1],
+            y[rows, candidates], y[rows, candidates + 1]
+        )
+
+        for row, a, b, ya, yb in zip(rows, low, high, y_low, y_high):
+            finite_a, finite_b = np.isfinite(ya), np.isfinite(yb)
+
+            if finite_a and finite_b and abs(yb - ya) <= JUMP_THRESHOLD * scale[row]:
+                continue
+
+            breaks[row].append(float(b))
+            extra_x.extend((a, b))
+
+            largest = max(abs(ya) if finite_a else 0.0, abs(yb) if finite_b else 0.0)
+            if largest > POLE_RATIO * (scale[row] + 1):
+                poles.append(float((a + b) / 2))
+
+    if extra_x:
+        extra_x = np.array(extra_x)
+        order = np.argsort(np.concatenate([x, extra_x]), kind='stable')
+        x = np.concatenate([x, extra_x])[order]
+        y = np.concatenate([y, _evaluate(funcs, extra_x)], axis=1)[:, order]
+
+    return Sampling(
+        x, y,
+        [sorted(row_breaks) for row_breaks in breaks],
+        _merge(sorted(poles), (x_max - x_min) * 1e-6),
+        uniform_y
+    )
+
+
+def _merge(points: List[float], tolerance: float) -> List[float]:
+    merged = []
+    for point in points:
+        if not merged or point - merged[-1] > tolerance:
+            merged.append(point)
+    return merged
+
+
+def split(sampling: Sampling, row: int = 0) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Делит выборку функции с номером row на непрерывные сегменты по разрывам и NaN.
+
+    Разрыв хранится как правый конец сжатого интервала, поэтому новый
+    сегмент начинается с первой точки не левее него.
+    """
+    x, y = sampling.x, sampling.y[row]
+    cut = np.zeros(x.size, dtype=bool)
+    positions = np.searchsorted(x, sampling.breaks[row], side='left')
+    cut[positions[positions < x.size]] = True
+    cut |= ~np.isfinite(y)
+
+    segments = []
+    start = 0
+    for index in np.append(np.flatnonzero(cut), x.size):
+        mask = np.isfinite(y[start:index])
+        if np.count_nonzero(mask) >= 2:
+            segments.append((x[start:index][mask], y[start:index][mask]))
+        start = index
+
+    return segments
@@ -0,0 +1,271 @@
+"""Бенчмарк горячих путей бота: калькулятор, решатель, графики, хранилище.
+
+Запуск:
+    python benchmark.py                      # замер и сравнение с базовой линией
+    python benchmark.py --save-baseline      # сохранить результаты как базовую линию
+    python benchmark.py --only calculator solver --repeat 20
+    python benchmark.py --only formats       # время и размер графиков по профилям вывода
+
+Код возврата 1, если p50 или p95 какого-либо замера хуже базовой линии
+больше чем на --tolerance (по умолчанию 25%).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence
+
+EXPRESSIONS = [
+    '2+2*2',
+    '(1+2)*(3+4)/5',
+    '2^10',
+    'sqrt(16)+sqrt(2)',
+    'sin(pi/2)+cos(0)',
+    'exp(1)*ln(e)',
+    'log(1000)',
+    'abs(-3.5)*2',
+    'tan(pi/4)^2',
+    '((((1+2)*3)-4)/5)^2',
+]
+
+EQUATIONS = {
+    'linear': ['2*x + 5 = 15', '3*x - 7 = 2*x + 1', 'x/4 + 1 = 3'],
+    'quadratic': ['x**2 - 4 = 0', 'x^2 - 5*x + 6 = 0', '2*x^2 + 3*x - 2 = 0', 'x^2 + 1 = 0'],
+    'cubic': ['x^3 - 6*x^2 + 11*x - 6 = 0', 'x^3 - 2*x^2 + x - 1 = 0'],
+    'trig': ['sin(x) = 0.5', 'cos(x) = 0', 'tan(x) = 1'],
+    'explog': ['exp(x) = 10', 'log(x) = 2', '2**x = 8'],
+}
+
+FUNCTIONS = [
+    'x^2',
+    'sin(x)',
+    'cos(x)',
+    'exp(x)',
+    'log(x)',
+    'sqrt(x)',
+    '1/x',
+    'abs(x)',
+    'x^3',
+    'tan(x)',
+    'sin(x)*cos(x)',
+    'exp(-x^2/2)',
+]
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * q / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def measure(name: str, func: Callable, inputs: Sequence, repeat: int, warmup: int = 1) -> Dict:
+    """Замеряет задержки func(item) за repeat проходов и пик памяти за отдельный проход"""
+    for _ in range(warmup):
+        for item in inputs:
+            func(item)
+
+    gc.collect()
+    timings = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            func(item)
+            timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            func(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'name': name,
+        'calls': len(timings),
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'p50_ms': _percentile(timings, 50) * 1000,
+        'p95_ms': _percentile(timings, 95) * 1000,
+        'p99_ms': _percentile(timings, 99) * 1000,
+        'peak_kb': peak / 1024,
+    }
+    print(f"{name:<28} p50={result['p50_ms']:9.3f} ms  p95={result['p95_ms']:9.3f} ms  "
+          f"p99={result['p99_ms']:9.3f} ms  peak={result['peak_kb']:9.1f} KB")
+    return result
+
+
+def bench_calculator(repeat: int) -> List[Dict]:
+    from calculator import Calculator
+
+    calculator = Calculator()
+    cold = Calculator(cache_size=0)
+    return [
+        measure('calculator.evaluate', calculator.evaluate, EXPRESSIONS, repeat * 10),
+        measure('calculator.evaluate[cold]', cold.evaluate, EXPRESSIONS, repeat),
+    ]
+
+
+def bench_solver(repeat: int) -> List[Dict]:
+    from equation_solver import EquationSolver
+
+    solver = EquationSolver()
+    return [
+        measure(f'solver.solve[{kind}]', solver.solve, equations, repeat)
+        for kind, equations in EQUATIONS.items()
+    ]
+
+
+def bench_plotter(repeat: int) -> List[Dict]:
+    from graph_plotter import GraphPlotter
+
+    plotter = GraphPlotter()
+    results = [measure('plotter.create_graph', plotter.create_graph, FUNCTIONS, repeat)]
+
+    import render_bank
+    presets = render_bank.preset_functions(plotter)
+    with tempfile.TemporaryDirectory() as directory:
+        bank = render_bank.load_or_build(os.path.join(directory, 'bank.bin'), plotter, presets)
+        results.append(measure('plotter.presets', plotter.create_graph, presets, repeat))
+        results.append(measure('render_bank.get', lambda f: bank.get(plotter.graph_key(f)), presets, repeat))
+    return results
+
+
+def bench_formats(repeat: int) -> List[Dict]:
+    """Время построения и размер изображения для каждого профиля вывода графиков"""
+    from graph_plotter import GraphPlotter
+    from graph_renderer import PROFILES, GraphRenderer
+
+    results = []
+    for name, profile in PROFILES.items():
+        plotter = GraphPlotter(renderer=GraphRenderer(profile=profile))
+        result = measure(f'graph_format[{name}]', plotter.create_graph, FUNCTIONS, repeat)
+        sizes = [plotter.create_graph(func)[0].getbuffer().nbytes for func in FUNCTIONS]
+        result['mean_kb'] = sum(sizes) / len(sizes) / 1024
+        print(f"{'':<28} размер: {result['mean_kb']:.1f} KB")
+        results.append(result)
+    return results
+
+
+def bench_storage(repeat: int) -> List[Dict]:
+    import config
+    import database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original = config.DATABASE_NAME
+        config.DATABASE_NAME = os.path.join(tmp, 'bench.db')
+        try:
+            database.init_db(config.DATABASE_NAME)
+            user_ids = list(range(200))
+
+            def add_user(user_id):
+                database.add_user(user_id, f'user{user_id}', 'Имя', 'Фамилия')
+
+            def log_command(user_id):
+                database.log_command(user_id, 'calc', '2+2*2')
+
+            def log_message(user_id):
+                database.log_message(user_id, 'solve: x^2 - 4 = 0', 'solutions: [-2, 2]')
+
+            results = [
+                measure('database.add_user', add_user, user_ids, repeat),
+                measure('database.log_command', log_command, user_ids, repeat),
+                measure('database.log_message', log_message, user_ids, repeat),
+                measure('database.get_stats', lambda _: database.get_stats(), range(10), repeat),
+                measure('database.flush', lambda _: database.flush(), range(10), repeat),
+            ]
+        finally:
+            database.close()
+            config.DATABASE_NAME = original
+    return results
+
+
+SUITES = {
+    'calculator': bench_calculator,
+    'solver': bench_solver,
+    'plotter': bench_plotter,
+    'formats': bench_formats,
+    'storage': bench_storage,
+}
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Возвращает список регрессий относительно базовой линии"""
+    previous = {item['name']: item for item in baseline.get('results', [])}
+    regressions = []
+
+    for item in results:
+        old = previous.get(item['name'])
+        if old is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if old[metric] > 0 and item[metric] > old[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{item['name']}: {metric} {old[metric]:.3f} -> {item[metric]:.3f} ms "
+                    f"(+{(item[metric] / old[metric] - 1) * 100:.0f}%)"
+                )
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарк Math Solution Assistant')
+    parser.add_argument('--only', nargs='+', choices=sorted(SUITES), help='какие наборы запускать')
+    parser.add_argument('--repeat', type=int, default=5, help='число повторов каждого корпуса')
+    parser.add_argument('--output', default='benchmark_results.json', help='файл для результатов')
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help='файл базовой линии')
+    parser.add_argument('--save-baseline', action='store_true', help='сохранить результаты как базовую линию')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение (доля)')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.only or SUITES:
+        print(f"\n== {name} ==")
+        results.extend(SUITES[name](args.repeat))
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 Результаты сохранены: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📌 Базовая линия обновлена: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ Базовая линия не найдена, сравнение пропущено")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Обнаружены регрессии:")
+        for line in regressions:
+            print(f"  • {line}")
+        return 1
+
+    print("✅ Регрессий нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
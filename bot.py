@@ -1,3 +1,7 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
 import logging
 import signal
 import atexit
@@ -5,24 +9,27 @@ from telegram.ext import Application
 
 import config
 import database
+from log_setup import setup_logging
 from process_manager import ProcessManager
 from bot_instance import MathHelperBot
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler('bot.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def main():
+    setup_logging(
+        config.LOG_FILE,
+        level=config.LOG_LEVEL,
+        max_bytes=int(config.LOG_MAX_MB * 1024 * 1024),
+        backups=config.LOG_BACKUPS,
+        rotate_when=config.LOG_ROTATE_WHEN,
+        json_file=config.LOG_JSON
+    )
+    
     process_manager = ProcessManager('math_bot.pid')
     process_manager.check_existing_process()
     process_manager.create_pid_file()
     process_manager.register_handlers()
+    process_manager.add_cleanup_hook(database.close)
 
     print("=" * 50)
     print("🤖 Math Solution Assistant (версия 0.0.1) запускается...")
@@ -36,10 +43,18 @@ def main():
         return
 
     try:
-        bot = MathHelperBot(config.TOKEN)
+        if config.BOT_PROCESSES > 1:
+            from supervisor import Supervisor
+            print(f"📊 База данных: {config.DATABASE_NAME}")
+            print(f"🔄 Бот запускается в режиме {config.BOT_MODE}...")
+            Supervisor(config.TOKEN, config.BOT_PROCESSES).run()
+            return
+        
+        bot = MathHelperBot(config.TOKEN, started_at=STARTED_AT)
+        bot.handlers.services.start_warm_up()
         print("✅ Бот инициализирован")
         print(f"📊 База данных: {config.DATABASE_NAME}")
-        print("🔄 Бот запускается в режиме polling...")
+        print(f"🔄 Бот запускается в режиме {config.BOT_MODE}...")
         bot.run()
     except Exception as e:
         print(f"❌ Ошибка запуска бота: {e}")
@@ -1,36 +1,209 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Optional
+
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
 from telegram import Update
 from telegram.ext import ContextTypes
-from typing import Dict, Any
+from telegram.request import HTTPXRequest
 
+import config
+import metrics
+from profiling import PROFILER
 from handlers import Handlers
+from scheduler import JobScheduler
+from session_store import SessionStore
+from update_processor import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+class TimedRequest(HTTPXRequest):
+    """HTTP-клиент Bot API, замеряющий время каждого запроса к Telegram"""
+    async def do_request(self, *args, **kwargs):
+        with metrics.stage('telegram_api'):
+            return await super().do_request(*args, **kwargs)
+
+
+def application_builder(token: str):
+    """Построитель приложения с адресом Bot API из настроек"""
+    builder = Application.builder().token(token)
+    if config.BOT_API_BASE_URL:
+        builder = builder.base_url(config.BOT_API_BASE_URL)
+    if config.BOT_API_BASE_FILE_URL:
+        builder = builder.base_file_url(config.BOT_API_BASE_FILE_URL)
+    return builder
+
+
+def serve(application: Application):
+    """Принимает обновления через polling или webhook (BOT_MODE) до остановки"""
+    if config.BOT_MODE == 'webhook':
+        run_webhook(application)
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+
+
+def run_webhook(application: Application):
+    """Запуск в режиме webhook.
+    
+    Обновления принимает локальный HTTP-сервер, ожидающие доставки обновления
+    не сбрасываются. При остановке приложение дожидается обработки всех
+    принятых обновлений и только потом завершается.
+    """
+    if not config.WEBHOOK_URL:
+        raise ValueError("Для режима webhook нужно указать WEBHOOK_URL")
+    
+    print(f"🌐 Webhook: {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}/{config.WEBHOOK_URL_PATH}")
+    application.run_webhook(
+        listen=config.WEBHOOK_LISTEN,
+        port=config.WEBHOOK_PORT,
+        url_path=config.WEBHOOK_URL_PATH,
+        webhook_url=config.WEBHOOK_URL,
+        secret_token=config.WEBHOOK_SECRET or None,
+        max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=False
+    )
+
 
 class MathHelperBot:
-    def __init__(self, token: str):
+    """Бот целиком: приложение, сессии, планировщик и обработчики.
+    
+    При shard=None бот сам получает обновления из Telegram. Шард в режиме
+    супервизора (supervisor.py) получает обновления своих пользователей от
+    супервизора, хранит сессии в отдельном файле и отдаёт метрики на порту
+    METRICS_PORT + shard.
+    """
+    def __init__(self, token: str, started_at: Optional[float] = None, shard: Optional[int] = None):
         self.token = token
-        self.application = Application.builder().token(token).build()
-        self.user_data: Dict[int, Dict[str, Any]] = {}
-        self.handlers = Handlers(self)
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.shard = shard
         
+        builder = (
+            application_builder(token)
+            .concurrent_updates(PerUserUpdateProcessor(config.CONCURRENT_UPDATES))
+            .request(TimedRequest())
+            .post_init(self._on_ready)
+        )
+        if shard is not None:
+            builder = builder.updater(None)
+        
+        self.application = builder.build()
+        snapshot_path = config.SESSION_SNAPSHOT or None
+        if snapshot_path and shard is not None:
+            path = Path(snapshot_path)
+            snapshot_path = str(path.with_name(f"{path.stem}.{shard}{path.suffix}"))
+        self.sessions = SessionStore(
+            ttl=config.SESSION_TTL,
+            max_entries=config.SESSION_MAX_ENTRIES,
+            snapshot_path=snapshot_path
+        )
+        self.sessions.load_snapshot()
+        self.scheduler = JobScheduler(
+            max_jobs=config.HEAVY_JOBS,
+            rate_per_minute=config.HEAVY_RATE_PER_MINUTE,
+            burst=config.HEAVY_BURST,
+            max_queue=config.HEAVY_QUEUE_MAX,
+            admin_ids=config.ADMIN_IDS
+        )
+        PROFILER.enabled = config.PROFILE_ENABLED
+        PROFILER.sample_rate = config.PROFILE_SAMPLE_RATE
+        PROFILER.slow_seconds = config.PROFILE_SLOW_SECONDS
+        PROFILER.directory = config.PROFILE_DIR
+        PROFILER.max_files = config.PROFILE_MAX_FILES
+        PROFILER.top = config.PROFILE_TOP
+        self.handlers = Handlers(self)
+    
+    async def _on_ready(self, application: Application):
+        """Сообщает, сколько времени заняла подготовка бота к приёму обновлений"""
+        elapsed = time.perf_counter() - self.started_at
+        if self.shard is None:
+            print(f"⚡ Бот готов к работе за {elapsed:.2f} с")
+        else:
+            logger.info(f"⚡ Шард {self.shard} готов к работе за {elapsed:.2f} с")
+    
     def setup_handlers(self):
-        """Настройка обработчиков команд"""
+        """Настройка обработчиков команд.
         
-        self.application.add_handler(CommandHandler("start", self.handlers.start))
-        self.application.add_handler(CommandHandler("help", self.handlers.help))
-        self.application.add_handler(CommandHandler("solve", self.handlers.solve_equation_command))
-        self.application.add_handler(CommandHandler("calc", self.handlers.calc_command))
-        self.application.add_handler(CommandHandler("about", self.handlers.about))
-        self.application.add_handler(CommandHandler("time", self.handlers.get_time))
-        self.application.add_handler(CommandHandler("stats", self.handlers.stats))
-        self.application.add_handler(CommandHandler("graph", self.handlers.graph_command))
+        Каждый обработчик оборачивается замером времени и ошибок (metrics)
+        и выборочным профилированием (profiling).
+        """
+        commands = {
+            "start": self.handlers.start,
+            "help": self.handlers.help,
+            "solve": self.handlers.solve_equation_command,
+            "calc": self.handlers.calc_command,
+            "about": self.handlers.about,
+            "time": self.handlers.get_time,
+            "stats": self.handlers.stats,
+            "graph": self.handlers.graph_command,
+            "profile": self.handlers.profile,
+        }
+        for command, callback in commands.items():
+            self.application.add_handler(CommandHandler(command, self._instrument(command, callback)))
         
         self.application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND, self.handlers.handle_text
+            filters.TEXT & ~filters.COMMAND, self._instrument("text", self.handlers.handle_text)
         ))
     
+    @staticmethod
+    def _instrument(name: str, callback):
+        return metrics.instrument(name, PROFILER.instrument(name, callback))
+    
+    def _start(self):
+        self.setup_handlers()
+        if config.METRICS_PORT:
+            metrics.start_server(config.METRICS_HOST, config.METRICS_PORT + (self.shard or 0))
+        self.handlers.services.solver_pool.start()
+    
+    def _stop(self):
+        self.handlers.services.solver_pool.stop()
+        self.sessions.save_snapshot()
+    
     def run(self):
         """Запуск бота"""
-        self.setup_handlers()
+        self._start()
         print("✅ Обработчики настроены")
         print("🤖 Бот запущен. Ожидаю сообщений...")
-        self.application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
\ No newline at end of file
+        try:
+            serve(self.application)
+        finally:
+            self._stop()
+    
+    def run_shard(self, conn):
+        """Запуск шарда: обновления приходят от супервизора через conn.
+        
+        Получение None или закрытие канала означает остановку: принятые
+        обновления и начатые задачи перед выходом обрабатываются до конца.
+        """
+        self._start()
+        logger.info(f"Шард {self.shard} запущен")
+        try:
+            asyncio.run(self._serve_shard(conn))
+        finally:
+            self._stop()
+    
+    async def _serve_shard(self, conn):
+        application = self.application
+        loop = asyncio.get_running_loop()
+        
+        await application.initialize()
+        await self._on_ready(application)
+        await application.start()
+        try:
+            while True:
+                data = await loop.run_in_executor(None, self._receive, conn)
+                if data is None:
+                    break
+                await application.update_queue.put(Update.de_json(data, application.bot))
+        finally:
+            await application.stop()
+            await application.shutdown()
+    
+    @staticmethod
+    def _receive(conn) -> Optional[dict]:
+        try:
+            return conn.recv()
+        except (EOFError, OSError):
+            return None
\ No newline at end of file
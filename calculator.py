@@ -1,9 +1,12 @@
-import re
 import math
-from typing import Union, List
+import time
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+from expression_compiler import ExpressionError, compile_expression
 
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024):
         self.operations = {
             '+': lambda a, b: a + b,
             '-': lambda a, b: a - b,
@@ -17,54 +20,39 @@ class Calculator:
             'sin': math.sin,
             'cos': math.cos,
             'tan': math.tan,
+            'cot': lambda x: 1 / math.tan(x),
+            'sec': lambda x: 1 / math.cos(x),
+            'csc': lambda x: 1 / math.sin(x),
+            'asin': math.asin,
+            'acos': math.acos,
+            'atan': math.atan,
             'sqrt': math.sqrt,
             'log': math.log10,
             'ln': math.log,
             'exp': math.exp,
             'abs': abs,
         }
+        
+        self.namespace = dict(self.functions, pi=math.pi, e=math.e)
+        self._compile = lru_cache(maxsize=cache_size)(self._compile_uncached)
+    
+    @staticmethod
+    def _normalize(expression: str) -> str:
+        """Приводит запись выражения к синтаксису python"""
+        expression = ''.join(expression.split())
+        return expression.replace('^', '**').replace('√', 'sqrt').replace('π', 'pi')
+    
+    def _compile_uncached(self, expression: str) -> Callable[[], Any]:
+        return compile_expression(expression, self.namespace, int_as_float=True)
+    
+    def compile(self, expression: str) -> Callable[[], Any]:
+        """Возвращает скомпилированное выражение (с кэшированием)"""
+        return self._compile(self._normalize(expression))
     
     def evaluate(self, expression: str) -> Union[float, str]:
         """Основной метод вычисления выражения"""
         try:
-            expression = expression.replace(' ', '').replace('^', '**')
-            
-            expression = expression.replace('√', 'sqrt')
-            expression = expression.replace('pi', str(math.pi))
-            expression = expression.replace('π', str(math.pi))
-            expression = expression.replace('e', str(math.e))
-            dangerous_patterns = ['__', 'import', 'exec', 'eval', 'open', 'file', 'os.', 'sys.', 'subprocess']
-            expr_lower = expression.lower()
-            for pattern in dangerous_patterns:
-                if pattern in expr_lower:
-                    raise ValueError("Выражение содержит недопустимые команды")
-            
-            for func_name in ['sin', 'cos', 'tan', 'sqrt', 'log', 'ln', 'exp', 'abs']:
-                if func_name in expr_lower:
-                    expression = re.sub(
-                        fr'{func_name}\((.+?)\)',
-                        lambda m: f'math.{func_name}({m.group(1)})',
-                        expression
-                    )
-            
-            allowed_names = {
-                'math': math,
-                'sin': math.sin,
-                'cos': math.cos,
-                'tan': math.tan,
-                'sqrt': math.sqrt,
-                'log': math.log10,
-                'ln': math.log,
-                'exp': math.exp,
-                'abs': abs,
-                'pi': math.pi,
-                'e': math.e
-            }
-            
-            if any(word in expression.lower() for word in ['import', '__', 'exec', 'eval', 'open', 'file']):
-                raise ValueError("Выражение содержит недопустимые команды")
-            
-            result = eval(expression, {"__builtins__": {}}, allowed_names)
+            result = self.compile(expression)()
             
             if result == float('inf') or result == float('-inf'):
                 return "∞" if result > 0 else "-∞"
@@ -77,11 +65,31 @@ class Calculator:
             
             return round(result, 10)
             
+        except ExpressionError:
+            raise
         except ZeroDivisionError:
             raise ValueError("Деление на ноль")
-        except SyntaxError:
-            raise ValueError("Синтаксическая ошибка в выражении")
-        except NameError as e:
-            raise ValueError(f"Неизвестная функция или переменная: {str(e)}")
+        except OverflowError:
+            raise ValueError("Результат слишком велик")
         except Exception as e:
-            raise ValueError(f"Неправильное выражение: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Неправильное выражение: {str(e)}")
+    
+    def evaluate_batch(self, expressions: Sequence[str], max_lines: int = 50,
+                       time_limit: float = 2.0) -> Tuple[List[Tuple[str, Any, Optional[str]]], int]:
+        """Вычисляет список выражений через общий кэш компиляции.
+        
+        Возвращает строки (выражение, результат, ошибка) и число выражений,
+        пропущенных из-за ограничения на количество строк или общее время.
+        """
+        rows = []
+        deadline = time.monotonic() + time_limit
+        
+        for expression in expressions[:max_lines]:
+            if time.monotonic() > deadline:
+                break
+            try:
+                rows.append((expression, self.evaluate(expression), None))
+            except ValueError as e:
+                rows.append((expression, None, str(e)))
+        
+        return rows, len(expressions) - len(rows)
\ No newline at end of file
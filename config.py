@@ -5,4 +5,58 @@ load_dotenv()
 
 TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 DATABASE_NAME = 'math_bot.db'
-ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS', '').split(','))) if os.getenv('ADMIN_IDS') else []
\ No newline at end of file
+ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS', '').split(','))) if os.getenv('ADMIN_IDS') else []
+
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+BOT_PROCESSES = int(os.getenv('BOT_PROCESSES', '1'))
+BOT_API_BASE_URL = os.getenv('BOT_API_BASE_URL', '')
+BOT_API_BASE_FILE_URL = os.getenv('BOT_API_BASE_FILE_URL', '')
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '32'))
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_URL_PATH = os.getenv('WEBHOOK_URL_PATH', 'telegram')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+SESSION_TTL = float(os.getenv('SESSION_TTL', str(24 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '100000'))
+SESSION_SNAPSHOT = os.getenv('SESSION_SNAPSHOT', 'sessions.json')
+
+SOLVER_WORKERS = int(os.getenv('SOLVER_WORKERS', '2'))
+SOLVER_TIMEOUT = float(os.getenv('SOLVER_TIMEOUT', '10'))
+SOLVER_SYMBOLIC_BUDGET = float(os.getenv('SOLVER_SYMBOLIC_BUDGET', '5'))
+SOLUTION_CACHE_SIZE = int(os.getenv('SOLUTION_CACHE_SIZE', '1024'))
+
+HEAVY_JOBS = int(os.getenv('HEAVY_JOBS', '4'))
+HEAVY_QUEUE_MAX = int(os.getenv('HEAVY_QUEUE_MAX', '100'))
+HEAVY_RATE_PER_MINUTE = float(os.getenv('HEAVY_RATE_PER_MINUTE', '10'))
+HEAVY_BURST = int(os.getenv('HEAVY_BURST', '5'))
+
+CALC_BATCH_MAX_LINES = int(os.getenv('CALC_BATCH_MAX_LINES', '50'))
+CALC_BATCH_TIME_LIMIT = float(os.getenv('CALC_BATCH_TIME_LIMIT', '2'))
+
+GRAPH_SAMPLES = int(os.getenv('GRAPH_SAMPLES', '1000'))
+GRAPH_CACHE_MB = float(os.getenv('GRAPH_CACHE_MB', '32'))
+GRAPH_CACHE_DIR = os.getenv('GRAPH_CACHE_DIR', '')
+GRAPH_CACHE_DIR_MB = float(os.getenv('GRAPH_CACHE_DIR_MB', '256'))
+GRAPH_PROFILE = os.getenv('GRAPH_PROFILE', 'png8')
+GRAPH_QUALITY = int(os.getenv('GRAPH_QUALITY', '0'))
+RENDER_BANK_PATH = os.getenv('RENDER_BANK_PATH', 'render_bank.bin')
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.1'))
+PROFILE_SLOW_SECONDS = float(os.getenv('PROFILE_SLOW_SECONDS', '2'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '25'))
+
+LOG_FILE = os.getenv('LOG_FILE', 'bot.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_MAX_MB = float(os.getenv('LOG_MAX_MB', '10'))
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', '5'))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')
+LOG_JSON = os.getenv('LOG_JSON', '1').lower() in ('1', 'true', 'yes')
\ No newline at end of file
@@ -1,14 +1,176 @@
+import asyncio
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import queue
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
 import logging
 
+import config
+import metrics
+
 logger = logging.getLogger(__name__)
 
-def init_db():
-    """Инициализация базы данных"""
-    conn = sqlite3.connect('math_bot.db')
+FLUSH_INTERVAL = 0.5
+MAX_BATCH = 500
+# Сколько ждать ответа потока записи, прежде чем считать его зависшим
+CALL_TIMEOUT = 10.0
+
+
+class _Storage:
+    """Долгоживущее соединение с БД, которым владеет фоновый поток записи.
+
+    Вставки в журнал и обновления last_activity складываются в очередь и
+    записываются пачками в одной транзакции. Чтения выполняются тем же
+    потоком после сброса накопленных записей.
+    """
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL, max_batch: int = MAX_BATCH):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, row: tuple):
+        """Ставит запись в очередь, не дожидаясь её выполнения"""
+        if self._closed:
+            logger.warning(f"Хранилище закрыто, запись отброшена: {kind}")
+            return
+        self._queue.put((kind, row))
+
+    def _enqueue_call(self, func: Callable[[sqlite3.Connection], Any]) -> Future:
+        if self._closed or not self._thread.is_alive():
+            raise RuntimeError("Хранилище закрыто")
+        future: Future = Future()
+        self._queue.put(('call', (func, future)))
+        return future
+
+    def call(self, func: Callable[[sqlite3.Connection], Any], timeout: float = CALL_TIMEOUT) -> Any:
+        """Выполняет func(conn) в потоке записи после сброса очереди.
+
+        Если поток не ответил за timeout секунд, бросает TimeoutError; ещё не
+        начатый вызов при этом отменяется.
+        """
+        future = self._enqueue_call(func)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    async def call_async(self, func: Callable[[sqlite3.Connection], Any], timeout: float = CALL_TIMEOUT) -> Any:
+        """То же, что call, но не блокирует цикл событий"""
+        return await asyncio.wait_for(asyncio.wrap_future(self._enqueue_call(func)), timeout)
+
+    def flush(self):
+        """Дожидается записи всех накопленных операций"""
+        if not self._closed:
+            self.call(lambda conn: None)
+
+    def close(self):
+        """Сбрасывает очередь и закрывает соединение"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(('stop', None))
+        self._thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        try:
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+
+                while batch[-1][0] not in ('call', 'stop') and len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+
+                self._write(conn, [item for item in batch if item[0] not in ('call', 'stop')])
+
+                kind, payload = batch[-1]
+                if kind == 'call':
+                    func, future = payload
+                    # Вызов, отменённый по таймауту (в call или call_async), пропускается
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        future.set_result(func(conn))
+                    except Exception as e:
+                        future.set_exception(e)
+                elif kind == 'stop':
+                    running = False
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, items: list):
+        if not items:
+            return
+
+        users = [row for kind, row in items if kind == 'user']
+        messages = [row for kind, row in items if kind == 'message']
+        activity = {}
+        for kind, row in items:
+            if kind in ('user', 'message'):
+                activity[row[0]] = row[-1]
+
+        try:
+            with conn, metrics.stage('db_write'):
+                conn.executemany('''
+                    INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, last_activity)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', users)
+
+                conn.executemany('''
+                    INSERT INTO messages (user_id, command, parameters, timestamp)
+                    VALUES (?, ?, ?, ?)
+                ''', messages)
+
+                conn.executemany('''
+                    UPDATE users SET last_activity = ? WHERE user_id = ?
+                ''', [(timestamp, user_id) for user_id, timestamp in activity.items()])
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка записи в БД ({len(items)} операций): {e}")
+
+
+_storage: Optional[_Storage] = None
+_storage_lock = threading.Lock()
+
+
+def _get_storage() -> _Storage:
+    """Текущее хранилище.
+
+    После close() возвращается закрытое хранилище: записи в него
+    отбрасываются с предупреждением, а не уходят в новый поток, который
+    никто не сбросит при завершении.
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = _Storage(config.DATABASE_NAME)
+        return _storage
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _create_schema(conn: sqlite3.Connection):
     cursor = conn.cursor()
-    
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY,
@@ -20,7 +182,7 @@ def init_db():
             last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS messages (
             id INTEGER PRIMARY KEY,
@@ -31,69 +193,164 @@ def init_db():
             timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
+
     conn.commit()
-    conn.close()
+    _migrate(conn)
+
+def _migrate(conn: sqlite3.Connection):
+    """Применяет недостающие миграции по PRAGMA user_version.
+
+    Версия перечитывается под блокировкой записи (BEGIN IMMEDIATE), поэтому
+    несколько процессов, открывших одну БД, не применят миграцию дважды.
+    """
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= len(MIGRATIONS):
+            conn.rollback()
+            return
+
+        target = version + 1
+        try:
+            for statement in MIGRATIONS[version]:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        logger.info(f"БД обновлена до версии схемы {target}")
+
+# Миграции схемы: MIGRATIONS[i] переводит БД с версии i на i + 1.
+# Версия 1: счётчики, активные пользователи по дням, индексы и триггеры,
+# которые поддерживают счётчики при вставках. Существующие данные
+# переносятся в счётчики до создания триггеров.
+MIGRATIONS = [
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS daily_active (
+            day TEXT,
+            user_id INTEGER,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS daily_counts (
+            day TEXT PRIMARY KEY,
+            users INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_messages_user_timestamp ON messages (user_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users (last_activity)',
+        '''
+        INSERT OR REPLACE INTO counters (name, value)
+        VALUES ('users', (SELECT COUNT(*) FROM users)),
+               ('messages', (SELECT COUNT(*) FROM messages))
+        ''',
+        '''
+        INSERT OR IGNORE INTO daily_active (day, user_id)
+        SELECT date(timestamp), user_id FROM messages WHERE timestamp IS NOT NULL
+        UNION
+        SELECT date(last_activity), user_id FROM users WHERE last_activity IS NOT NULL
+        ''',
+        '''
+        INSERT OR REPLACE INTO daily_counts (day, users)
+        SELECT day, COUNT(*) FROM daily_active GROUP BY day
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'users';
+            INSERT OR IGNORE INTO daily_active (day, user_id) VALUES (date(NEW.last_activity), NEW.user_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'users';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS users_activity_update AFTER UPDATE OF last_activity ON users BEGIN
+            INSERT OR IGNORE INTO daily_active (day, user_id) VALUES (date(NEW.last_activity), NEW.user_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_count_insert AFTER INSERT ON messages BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'messages';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_count_delete AFTER DELETE ON messages BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'messages';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS daily_active_insert AFTER INSERT ON daily_active BEGIN
+            INSERT INTO daily_counts (day, users) VALUES (NEW.day, 1)
+            ON CONFLICT (day) DO UPDATE SET users = users + 1;
+        END
+        ''',
+    ],
+]
+
+def init_db(path: Optional[str] = None):
+    """Инициализация базы данных"""
+    global _storage
+    with _storage_lock:
+        if _storage is not None and (path is not None and _storage.path != path):
+            _storage.close()
+            _storage = None
+        if _storage is None or _storage._closed:
+            _storage = _Storage(path or config.DATABASE_NAME)
+
+    _storage.call(_create_schema)
 
 def add_user(user_id, username=None, first_name=None, last_name=None):
     """Добавление пользователя в БД"""
-    conn = sqlite3.connect('math_bot.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, last_activity)
-        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-    ''', (user_id, username, first_name, last_name))
-    
-    cursor.execute('''
-        UPDATE users SET last_activity = CURRENT_TIMESTAMP WHERE user_id = ?
-    ''', (user_id,))
-    
-    conn.commit()
-    conn.close()
+    _get_storage().submit('user', (user_id, username, first_name, last_name, _now()))
 
 def log_command(user_id, command, parameters=''):
     """Логирование команды"""
-    conn = sqlite3.connect('math_bot.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO messages (user_id, command, parameters)
-        VALUES (?, ?, ?)
-    ''', (user_id, command, parameters))
-    
-    cursor.execute('''
-        UPDATE users SET last_activity = CURRENT_TIMESTAMP WHERE user_id = ?
-    ''', (user_id,))
-    
-    conn.commit()
-    conn.close()
+    _get_storage().submit('message', (user_id, command, parameters, _now()))
 
 def log_message(user_id, message, result=''):
     """Логирование сообщения"""
     log_command(user_id, 'message', f"{message}|{result}")
 
+def _read_stats(conn: sqlite3.Connection):
+    counters = dict(conn.execute(
+        "SELECT name, value FROM counters WHERE name IN ('users', 'messages')"
+    ).fetchall())
+
+    row = conn.execute(
+        "SELECT users FROM daily_counts WHERE day = date('now')"
+    ).fetchone()
+
+    return {
+        'total_users': counters.get('users', 0),
+        'total_messages': counters.get('messages', 0),
+        'active_today': row[0] if row else 0
+    }
+
 def get_stats():
     """Получение статистики"""
-    conn = sqlite3.connect('math_bot.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM messages')
-    total_messages = cursor.fetchone()[0]
-    
-    cursor.execute('''
-        SELECT COUNT(*) FROM users 
-        WHERE last_activity >= datetime('now', '-1 day')
-    ''')
-    active_today = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    return {
-        'total_users': total_users,
-        'total_messages': total_messages,
-        'active_today': active_today
-    }
\ No newline at end of file
+    return _get_storage().call(_read_stats)
+
+async def get_stats_async():
+    """Получение статистики без блокировки цикла событий"""
+    return await _get_storage().call_async(_read_stats)
+
+def flush():
+    """Дожидается записи накопленных операций"""
+    if _storage is not None:
+        _storage.flush()
+
+def close():
+    """Сброс очереди и закрытие соединения (вызывается при завершении)"""
+    if _storage is not None:
+        _storage.close()
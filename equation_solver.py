@@ -1,15 +1,47 @@
 import sympy
 import numpy as np
 import logging
-from typing import List, Tuple, Dict, Any
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Tuple, Dict, Any, Optional
+import metrics
 import utils
+from numeric_solver import find_real_roots
+from solution_cache import SolutionCache, canonical_form
 
 logger = logging.getLogger(__name__)
 
 
+TRIG_FUNCTIONS = (
+    sympy.sin, sympy.cos, sympy.tan, sympy.cot, sympy.sec, sympy.csc,
+    sympy.asin, sympy.acos, sympy.atan, sympy.acot,
+)
+
+TYPE_LABELS = {
+    'trig': 'тригонометрическое',
+    'exp': 'экспоненциальное',
+    'log': 'логарифмическое',
+    'rational': 'рациональное',
+    'algebraic': 'алгебраическое',
+}
+
+class SymbolicTimeout(Exception):
+    """Символьное решение не уложилось в отведённое время"""
+
+
+IDENTITY_MESSAGE = "♾ Уравнение верно при любом x (тождество)"
+
+ROOT_TOLERANCE = 1e-9
+CLUSTER_TOLERANCE = 1e-4
+
+
 class EquationSolver:
-    def __init__(self):
-        pass
+    def __init__(self, cache: Optional[SolutionCache] = None, exact_refinement: bool = True,
+                 symbolic_budget: float = 0):
+        self.cache = cache
+        self.exact_refinement = exact_refinement
+        self.symbolic_budget = symbolic_budget
 
     def solve(self, equation: str) -> Dict[str, Any]:
         result = {
@@ -32,13 +64,29 @@ class EquationSolver:
             
             try:
                 left, right = equation.split('=', 1)
-                expr = sympy.sympify(f"({left.strip()}) - ({right.strip()})")
-                solutions = sympy.solve(expr, x)
+                with metrics.stage('parse'):
+                    expr = sympy.sympify(f"({left.strip()}) - ({right.strip()})")
+                if self._is_identity(expr, x):
+                    result['error'] = True
+                    result['error_message'] = IDENTITY_MESSAGE
+                    return result
+                kind, degree = self._classify(expr, x)
+                solutions, complete = self._solve_cached(expr, x, kind, degree)
             except Exception as e:
                 result['error'] = True
                 result['error_message'] = f"❌ Не удалось решить уравнение: {str(e)[:100]}"
                 return result
 
+            if not solutions and self._is_identity(expr, x, thorough=True):
+                result['error'] = True
+                result['error_message'] = IDENTITY_MESSAGE
+                return result
+
+            if not solutions and not complete:
+                result['error'] = True
+                result['error_message'] = "⏱ Не удалось решить уравнение за отведённое время"
+                return result
+
             if not solutions:
                 result['error'] = True
                 result['error_message'] = "❌ Уравнение не имеет решений"
@@ -46,7 +94,7 @@ class EquationSolver:
 
             result['solutions'] = solutions
             result['count'] = len(solutions)
-            result['type'] = self._determine_equation_type(equation, solutions)
+            result['type'] = self._type_label(kind, degree)
             
         except Exception as e:
             logger.error(f"Equation solving error: {e}")
@@ -55,23 +103,177 @@ class EquationSolver:
 
         return result
 
-    def _determine_equation_type(self, equation: str, solutions) -> str:
-        equation_lower = equation.lower()
+    def _solve_cached(self, expr, x, kind: str, degree: Optional[int]) -> Tuple[list, bool]:
+        """Решение с кэшированием по канонической форме уравнения.
+
+        Возвращает решения и признак полноты, как _solve_structured.
+        """
+        if self.cache is None:
+            return self._solve_structured(expr, x, kind, degree)
         
-        if any('sin' in equation_lower or 'cos' in equation_lower or 'tan' in equation_lower for _ in solutions):
-            return 'тригонометрическое'
-        elif 'exp' in equation_lower:
-            return 'экспоненциальное'
-        elif 'log' in equation_lower or 'ln' in equation_lower:
-            return 'логарифмическое'
-        elif len(solutions) > 2:
-            return f'полиномиальное {len(solutions)}-й степени'
-        elif len(solutions) == 2:
-            return 'квадратное'
-        elif len(solutions) == 1:
-            return 'линейное'
+        canonical = canonical_form(expr)
+        solutions = self.cache.get(canonical)
+        complete = True
         
-        return 'алгебраическое'
+        if solutions is None:
+            solutions, complete = self._solve_structured(expr, x, kind, degree)
+            # Результат, урезанный из-за нехватки времени, зависит от нагрузки
+            # машины — его не запоминаем, чтобы потом получить точный ответ
+            if complete:
+                self.cache.put(canonical, solutions)
+        
+        return solutions, complete
+
+    def _is_identity(self, expr, x, thorough: bool = False) -> bool:
+        """Тождественно ли выражение равно нулю: x = x, sin(x)**2 + cos(x)**2 = 1.
+
+        Без thorough проверяются только дешёвые случаи (многочлены);
+        sympy.simplify вызывается, лишь когда корни не найдены.
+        """
+        if expr.is_zero:
+            return True
+        if expr.is_polynomial(x):
+            return expr.expand() == 0
+        if not thorough:
+            return False
+        try:
+            with self._time_budget():
+                return sympy.simplify(expr) == 0
+        except SymbolicTimeout:
+            return False
+
+    def _classify(self, expr, x) -> Tuple[str, Optional[int]]:
+        """Определяет класс уравнения expr = 0 по его структуре"""
+        if expr.has(*TRIG_FUNCTIONS):
+            return 'trig', None
+        if expr.has(sympy.log):
+            return 'log', None
+        if expr.has(sympy.exp) or any(power.exp.has(x) for power in expr.atoms(sympy.Pow)):
+            return 'exp', None
+        if expr.is_polynomial(x):
+            if not expr.has(x):
+                return 'algebraic', 0
+            return 'polynomial', sympy.Poly(expr, x).degree()
+        if expr.is_rational_function(x):
+            return 'rational', None
+        return 'algebraic', None
+
+    def _type_label(self, kind: str, degree: Optional[int]) -> str:
+        if kind == 'polynomial':
+            if degree == 1:
+                return 'линейное'
+            if degree == 2:
+                return 'квадратное'
+            return f'полиномиальное {degree}-й степени'
+        return TYPE_LABELS[kind]
+
+    def _solve_structured(self, expr, x, kind: str, degree: Optional[int]) -> Tuple[list, bool]:
+        """Быстрые пути для многочленов, остальное — через sympy.solve.
+
+        Если символьное решение ничего не нашло, упало или не уложилось в
+        symbolic_budget, корни ищутся численно. Возвращает решения и
+        признак полноты: False, если символьное решение прервано по времени.
+        """
+        if kind == 'polynomial':
+            poly = sympy.Poly(expr, x)
+            coeffs = poly.all_coeffs()
+            
+            if all(c.is_number for c in coeffs):
+                if degree == 1:
+                    return self._solve_linear(*coeffs), True
+                if degree == 2:
+                    return self._solve_quadratic(*coeffs), True
+                return self._solve_polynomial(poly), True
+        
+        try:
+            with self._time_budget(), metrics.stage('sympy_solve'):
+                solutions = sympy.solve(expr, x)
+        except Exception as e:
+            timed_out = isinstance(e, SymbolicTimeout)
+            if not timed_out:
+                logger.info(f"Symbolic solve failed, trying numeric: {e}")
+            solutions = self._find_numerical_solutions(expr, x)
+            if not solutions and not timed_out:
+                raise
+            return solutions, not timed_out
+        
+        return solutions or self._find_numerical_solutions(expr, x), True
+
+    @contextmanager
+    def _time_budget(self):
+        """Ограничивает время символьного решения через SIGALRM.
+
+        Работает только в главном потоке (в рабочих процессах пула решателя);
+        в остальных случаях ограничение не действует.
+        """
+        if (self.symbolic_budget <= 0 or not hasattr(signal, 'setitimer')
+                or threading.current_thread() is not threading.main_thread()):
+            yield
+            return
+        
+        def on_timeout(signum, frame):
+            raise SymbolicTimeout()
+        
+        previous = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, self.symbolic_budget)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    def _solve_linear(self, a, b) -> list:
+        return [-b / a]
+
+    def _solve_quadratic(self, a, b, c) -> list:
+        discriminant = b**2 - 4*a*c
+        
+        if discriminant == 0:
+            return [-b / (2*a)]
+        
+        root = sympy.sqrt(discriminant)
+        solutions = [(-b - root) / (2*a), (-b + root) / (2*a)]
+        
+        if discriminant.is_positive:
+            solutions.sort(key=float)
+        
+        return solutions
+
+    def _solve_polynomial(self, poly) -> list:
+        """Корни многочлена через собственные числа матрицы-компаньона (numpy.roots).
+
+        При exact_refinement рациональные корни многочлена с рациональными
+        коэффициентами находятся точно и заменяют свои численные приближения.
+        """
+        numeric = list(np.roots([complex(c) for c in poly.all_coeffs()]))
+        solutions = []
+        
+        if self.exact_refinement and poly.get_domain() in (sympy.ZZ, sympy.QQ):
+            for root, multiplicity in poly.ground_roots().items():
+                solutions.append(root)
+                for _ in range(multiplicity):
+                    numeric.remove(min(numeric, key=lambda r: abs(r - float(root))))
+        
+        # Кратный корень numpy возвращает облаком близких значений — усредняем его
+        clusters = []
+        for r in numeric:
+            for cluster in clusters:
+                if abs(r - cluster[0]) <= CLUSTER_TOLERANCE * (1 + abs(r)):
+                    cluster.append(r)
+                    break
+            else:
+                clusters.append([r])
+        
+        for cluster in clusters:
+            r = sum(cluster) / len(cluster)
+            real = 0.0 if abs(r.real) <= ROOT_TOLERANCE * abs(r) else r.real
+            imag = 0.0 if abs(r.imag) <= ROOT_TOLERANCE * abs(r) else r.imag
+            value = sympy.Float(real, 12)
+            if imag:
+                value += sympy.Float(imag, 12) * sympy.I
+            solutions.append(value)
+        
+        return sorted(solutions, key=lambda s: (not s.is_real, complex(s).real, complex(s).imag))
 
     def format_solution(self, result: Dict[str, Any]) -> str:
         if result['error']:
@@ -144,23 +346,27 @@ class EquationSolver:
         except:
             return False
 
-    def _find_numerical_solutions(self, equation_sympy, x, ranges: List[Tuple[float, float]] = None) -> List[float]:
-        if ranges is None:
-            ranges = [(-10, 10), (-100, 100), (-1000, 1000)]
+    def _find_numerical_solutions(self, expr, x) -> list:
+        """Численные вещественные корни: векторизованный Ньютон и поиск смены знака.
+
+        Если производную не удаётся перевести в numpy (например, у abs(x)),
+        Ньютон шагает по секущей, а смены знака ищутся как обычно.
+        """
+        try:
+            f = sympy.lambdify(x, expr, 'numpy')
+        except Exception as e:
+            logger.info(f"Numeric solve failed: {e}")
+            return []
         
-        solutions = []
+        try:
+            df = sympy.lambdify(x, sympy.diff(expr, x), 'numpy')
+        except Exception:
+            df = lambda values: np.full(np.shape(values), np.nan)
+        
+        try:
+            roots = find_real_roots(f, df)
+        except Exception as e:
+            logger.info(f"Numeric solve failed: {e}")
+            return []
         
-        for start, end in ranges:
-            for guess in np.linspace(start, end, 10):
-                try:
-                    sol = sympy.nsolve(equation_sympy, x, guess, tol=1e-10, maxsteps=100)
-                    
-                    if sol is not None:
-                        sol_float = float(sol)
-                        if not any(abs(sol_float - existing) < 1e-6 for existing in solutions):
-                            solutions.append(sol_float)
-                            
-                except (ValueError, ZeroDivisionError, RuntimeError):
-                    continue
-                    
-        return solutions
\ No newline at end of file
+        return [sympy.Float(root, 12) for root in roots]
@@ -0,0 +1,73 @@
+import ast
+from typing import Any, Callable, Dict, Iterable
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.FloorDiv, ast.USub, ast.UAdd,
+)
+
+
+class ExpressionError(ValueError):
+    """Ошибка разбора или проверки выражения"""
+
+
+def parse_expression(text: str, allowed_names: Iterable[str]) -> ast.Expression:
+    """Разбирает выражение в AST и проверяет его по белому списку"""
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        raise ExpressionError("Синтаксическая ошибка в выражении")
+
+    allowed_names = set(allowed_names)
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ExpressionError(f"Недопустимая конструкция: {type(node).__name__}")
+
+        if isinstance(node, ast.Name) and node.id not in allowed_names:
+            raise ExpressionError(f"Неизвестная функция или переменная: {node.id}")
+
+        if isinstance(node, ast.Call) and (node.keywords or not isinstance(node.func, ast.Name)):
+            raise ExpressionError("Недопустимый вызов функции")
+
+        if isinstance(node, ast.Constant) and (
+                isinstance(node.value, bool) or not isinstance(node.value, (int, float, complex))):
+            raise ExpressionError(f"Недопустимая константа: {node.value!r}")
+
+    return tree
+
+
+class _IntToFloat(ast.NodeTransformer):
+    def visit_Constant(self, node: ast.Constant) -> ast.Constant:
+        if isinstance(node.value, int):
+            return ast.copy_location(ast.Constant(value=float(node.value)), node)
+        return node
+
+
+def compile_expression(text: str, namespace: Dict[str, Any],
+                       variables: Iterable[str] = (), int_as_float: bool = False) -> Callable[..., Any]:
+    """Компилирует выражение в функцию от переменных variables.
+
+    Разбор и проверка выполняются один раз, дальше вызывается обычная
+    python-функция, имена из namespace доступны как глобальные.
+    int_as_float переводит целые константы в float, чтобы степени вроде
+    9**9**9 переполнялись сразу, а не считались длинной арифметикой.
+    """
+    variables = tuple(variables)
+    tree = parse_expression(text, set(namespace) | set(variables))
+
+    if int_as_float:
+        tree = _IntToFloat().visit(tree)
+
+    args = ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg(arg=name) for name in variables],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+    lambda_tree = ast.Expression(body=ast.Lambda(args=args, body=tree.body))
+    ast.fix_missing_locations(lambda_tree)
+
+    code = compile(lambda_tree, '<expression>', 'eval')
+    return eval(code, {'__builtins__': {}, **namespace})
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class GraphCache:
+    """LRU-кэш готовых изображений графиков с ограничением по памяти.
+
+    Вытесненные изображения при наличии spill_dir сохраняются на диск;
+    сверх max_disk_bytes самые давно использованные файлы удаляются.
+    Отдельно хранятся file_id Telegram для уже отправленных графиков,
+    чтобы повторно не загружать изображение.
+    """
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, spill_dir: Optional[str] = None,
+                 max_file_ids: int = 10000, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_file_ids = max_file_ids
+        self.max_disk_bytes = max_disk_bytes
+        self.current_bytes = 0
+        self.disk_bytes = 0
+        self._entries: 'OrderedDict[str, Tuple[bytes, Dict[str, Any]]]' = OrderedDict()
+        self._file_ids: 'OrderedDict[str, Tuple[str, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._prune()
+
+    @staticmethod
+    def make_key(func_str: str, x_range: Tuple[float, float], options: Dict[str, Any]) -> str:
+        """Ключ кэша: нормализованная функция + диапазон + параметры отрисовки"""
+        raw = json.dumps([func_str, list(x_range), options], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """Возвращает (изображение, info) из памяти или с диска"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._load_spilled(key)
+        if entry is not None:
+            self.put(key, *entry)
+        return entry
+
+    def put(self, key: str, data: bytes, info: Dict[str, Any]):
+        """Добавляет изображение и вытесняет старые записи сверх бюджета"""
+        if len(data) > self.max_bytes:
+            return
+
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old[0])
+
+            self._entries[key] = (data, info)
+            self.current_bytes += len(data)
+
+            while self.current_bytes > self.max_bytes:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self.current_bytes -= len(old_entry[0])
+                evicted.append((old_key, old_entry))
+
+        for old_key, old_entry in evicted:
+            self._spill(old_key, *old_entry)
+
+    def get_file_id(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Возвращает (file_id, info) ранее отправленного графика"""
+        with self._lock:
+            entry = self._file_ids.get(key)
+            if entry is not None:
+                self._file_ids.move_to_end(key)
+            return entry
+
+    def set_file_id(self, key: str, file_id: str, info: Dict[str, Any]):
+        """Запоминает file_id, который Telegram вернул после загрузки"""
+        with self._lock:
+            self._file_ids[key] = (file_id, info)
+            self._file_ids.move_to_end(key)
+            while len(self._file_ids) > self.max_file_ids:
+                self._file_ids.popitem(last=False)
+
+    def drop_file_id(self, key: str):
+        """Забывает недействительный file_id"""
+        with self._lock:
+            self._file_ids.pop(key, None)
+
+    def _spill_paths(self, key: str) -> Tuple[Path, Path]:
+        return self.spill_dir / f"{key}.img", self.spill_dir / f"{key}.json"
+
+    def _spill(self, key: str, data: bytes, info: Dict[str, Any]):
+        if not self.spill_dir:
+            return
+        data_path, info_path = self._spill_paths(key)
+        # Каталог может быть общим для нескольких процессов бота: каждый пишет
+        # во временный файл со своим pid и атомарно подменяет готовый
+        try:
+            for path, content in ((info_path, json.dumps(info, ensure_ascii=False).encode('utf-8')),
+                                  (data_path, data)):
+                tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить график на диск: {e}")
+            return
+
+        self.disk_bytes += len(data)
+        if self.disk_bytes > self.max_disk_bytes:
+            self._prune()
+
+    def _prune(self):
+        """Удаляет самые давно использованные файлы, пока каталог больше 90% max_disk_bytes.
+
+        Размер каталога пересчитывается по файлам: в него могут писать
+        несколько процессов бота.
+        """
+        files = []
+        for data_path in self.spill_dir.glob('*.img'):
+            try:
+                stat = data_path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, data_path))
+
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9 if total > self.max_disk_bytes else total
+        removed = 0
+        for _, size, data_path in sorted(files):
+            if total <= target:
+                break
+            for path in (data_path, data_path.with_suffix('.json')):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+
+        self.disk_bytes = total
+        if removed:
+            logger.info(f"Из каталога кэша графиков удалено файлов: {removed}")
+
+    def _load_spilled(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        if not self.spill_dir:
+            return None
+        data_path, info_path = self._spill_paths(key)
+        try:
+            data = data_path.read_bytes()
+            info = json.loads(info_path.read_text(encoding='utf-8'))
+            # Время изменения отмечает последнее использование для _prune
+            os.utime(data_path)
+        except (OSError, ValueError):
+            return None
+        info['x_range'] = tuple(info['x_range'])
+        return data, info
@@ -1,16 +1,60 @@
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import numpy as np
 import io
 import re
-from typing import Tuple, Optional, Dict, Any
+from typing import Callable, Tuple, Optional, Dict, Any
+import logging
 import warnings
 
+import adaptive_sampler
+import metrics
+from expression_compiler import ExpressionError, compile_expression
+from graph_cache import GraphCache
+from graph_renderer import GraphRenderer
+
 warnings.filterwarnings("ignore")
 
+logger = logging.getLogger(__name__)
+
+# Сколько функций можно наложить на один график
+MAX_FUNCTIONS = 6
+
+NUMPY_NAMESPACE = {
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'cot': lambda x: 1 / np.tan(x),
+    'sec': lambda x: 1 / np.cos(x),
+    'csc': lambda x: 1 / np.sin(x),
+    'asin': np.arcsin,
+    'acos': np.arccos,
+    'atan': np.arctan,
+    'sinh': np.sinh,
+    'cosh': np.cosh,
+    'tanh': np.tanh,
+    'sqrt': np.sqrt,
+    'exp': np.exp,
+    'log': np.log,
+    'ln': np.log,
+    'log10': np.log10,
+    'abs': np.abs,
+    'floor': np.floor,
+    'ceil': np.ceil,
+    'pi': np.pi,
+    'e': np.e,
+}
+
 class GraphPlotter:
-    def __init__(self):
+    def __init__(self, samples: int = 1000, cache: Optional[GraphCache] = None,
+                 renderer: Optional[GraphRenderer] = None):
+        self.samples = samples
+        self.cache = cache
+        self.renderer = renderer or GraphRenderer()
+        self.render_options = {
+            'samples': samples,
+            'sampling': 'adaptive',
+            'figsize': self.renderer.figsize,
+            'profile': list(self.renderer.profile)
+        }
         self.standard_functions = {
             'x^2': lambda x: x**2,
             'x**2': lambda x: x**2,
@@ -30,46 +74,38 @@ class GraphPlotter:
             'x**3': lambda x: x**3,
         }
     
-    def _safe_eval(self, expr: str, x: float) -> Optional[float]:
-        """Безопасное вычисление выражения для одного значения x"""
-        try:
-            expr = expr.replace('^', '**')
-            expr = expr.replace('√', 'np.sqrt')
-            expr = expr.replace('abs', 'np.abs')
-            expr = expr.replace('ln', 'np.log')
-            expr = expr.replace('log', 'np.log10')
-            expr = expr.replace('e^', 'np.exp')
-            expr = expr.replace('exp', 'np.exp')
-            expr = expr.replace('sin', 'np.sin')
-            expr = expr.replace('cos', 'np.cos')
-            expr = expr.replace('tan', 'np.tan')
-            
-            if '1/x' in expr or '/x' in expr:
-                if abs(x) < 0.001:
-                    return None
-            
-            result = eval(expr, {
-                'x': x,
-                'np': np,
-                'pi': np.pi,
-                'e': np.e,
-                'sqrt': np.sqrt,
-                'exp': np.exp,
-                'log': np.log,
-                'log10': np.log10,
-                'sin': np.sin,
-                'cos': np.cos,
-                'tan': np.tan,
-                'abs': np.abs
-            })
-            
-            if np.isnan(result) or np.isinf(result):
-                return None
-            
-            return float(result)
-            
-        except (ZeroDivisionError, ValueError, TypeError, SyntaxError):
-            return None
+    def _normalize(self, func_str: str) -> str:
+        """Приводит запись функции к единому виду"""
+        expr = ''.join(func_str.split())
+        expr = expr.replace('^', '**').replace('√', 'sqrt').replace('π', 'pi')
+        return re.sub(r'\|([^|]+)\|', r'abs(\1)', expr)
+    
+    @staticmethod
+    def split_functions(func_str: str) -> list:
+        """Разбивает запись из нескольких функций через ';'"""
+        return [part.strip() for part in func_str.split(';') if part.strip()]
+    
+    def _compile_function(self, func_str: str) -> Callable[[np.ndarray], np.ndarray]:
+        """Разбирает функцию один раз и возвращает векторизованный вызов"""
+        return compile_expression(self._normalize(func_str), NUMPY_NAMESPACE, ('x',))
+    
+    def graph_key(self, func_str: str) -> str:
+        """Ключ кэша для графика функции"""
+        return GraphCache.make_key(
+            self._normalize(func_str),
+            self._get_x_range(func_str),
+            self.render_options
+        )
+    
+    def _evaluate(self, func: Callable[[np.ndarray], np.ndarray], x: np.ndarray) -> np.ndarray:
+        """Вычисляет функцию на всём массиве x, недопустимые значения -> NaN"""
+        with np.errstate(all='ignore'):
+            y = np.asarray(func(x))
+        
+        if np.iscomplexobj(y):
+            y = np.where(np.abs(y.imag) < 1e-12, y.real, np.nan)
+        
+        return np.array(np.broadcast_to(y, x.shape), dtype=float)
     
     def _get_x_range(self, func_str: str) -> Tuple[float, float]:
         """Определяет подходящий диапазон для x"""
@@ -86,128 +122,127 @@ class GraphPlotter:
         
         return (-5, 5)
     
-    def _detect_discontinuities(self, func_str: str, x_range: Tuple[float, float]) -> list:
-        """Обнаруживает точки разрыва"""
-        func_lower = func_str.lower()
-        discontinuities = []
+    def prepare(self, func_str: str) -> Optional[Tuple[list, Dict[str, Any], Dict[str, Any]]]:
+        """Разбирает функцию и выбирает точки графика без отрисовки.
+
+        Возвращает сегменты (x, y, номер функции), параметры отрисовки для
+        GraphRenderer.render и info. При некорректной функции бросает
+        ExpressionError, если точек нет — возвращает None.
+        """
+        functions = self.split_functions(func_str)
+        if not functions:
+            raise ExpressionError("функция не указана")
+        if len(functions) > MAX_FUNCTIONS:
+            raise ExpressionError(f"не больше {MAX_FUNCTIONS} функций на одном графике")
         
-        if '1/x' in func_lower or '/x' in func_lower:
-            if x_range[0] < 0 < x_range[1]:
-                discontinuities.append(0)
-        
-        if 'tan(' in func_lower:
-            n_min = int(np.ceil((x_range[0] - np.pi/2) / np.pi))
-            n_max = int(np.floor((x_range[1] - np.pi/2) / np.pi))
-            for n in range(n_min, n_max + 1):
-                point = np.pi/2 + n * np.pi
-                if x_range[0] < point < x_range[1]:
-                    discontinuities.append(point)
-        
-        return discontinuities
+        with metrics.stage('parse'):
+            funcs = [self._compile_function(f) for f in functions]
+        has_reciprocal = '1/x' in func_str.lower() or '/x' in func_str.lower()
+        x_min, x_max = self._get_x_range(func_str)
+        
+        with metrics.stage('sampling'):
+            sampling = adaptive_sampler.sample(funcs, x_min, x_max, self.samples)
+        pieces = [adaptive_sampler.split(sampling, row) for row in range(len(funcs))]
+        segments = [
+            (seg_x, seg_y, row)
+            for row, row_pieces in enumerate(pieces)
+            for seg_x, seg_y in row_pieces
+        ]
+        
+        if not segments:
+            logger.warning(f"Не удалось построить график для функции: {func_str}")
+            return None
+        
+        discontinuous = any(
+            row_breaks and len(row_pieces) > 1
+            for row_breaks, row_pieces in zip(sampling.breaks, pieces)
+        )
+        graph_type = "discontinuous" if discontinuous else "continuous"
+        
+        all_y = np.concatenate([seg[1] for seg in segments])
+        bounds = []
+        for row, row_pieces in enumerate(pieces):
+            if not row_pieces:
+                continue
+            if sampling.poles and sampling.breaks[row]:
+                # У полюсов значения неограничены — пределы по равномерной сетке без выбросов
+                row_y = sampling.uniform_y[row]
+                bounds.append(np.percentile(row_y[np.isfinite(row_y)], [5, 95]))
+            else:
+                row_y = np.concatenate([seg_y for _, seg_y in row_pieces])
+                bounds.append((row_y.min(), row_y.max()))
+        y_min = float(min(low for low, _ in bounds))
+        y_max = float(max(high for _, high in bounds))
+        y_range = y_max - y_min
+        y_limits = None
+        
+        # Логарифмическая шкала возможна, только если есть положительные значения
+        positive = all_y[all_y > 0]
+        log_scale = (len(funcs) == 1 and y_range > 100 and positive.size > 0
+                     and ('exp' in func_str.lower() or 'e^' in func_str.lower()))
+        if log_scale:
+            y_limits = (float(positive.min()) / 1.5, float(positive.max()) * 1.5)
+        else:
+            if y_range < 0.1:
+                y_margin = 0.5
+            elif y_range < 10:
+                y_margin = y_range * 0.2
+            else:
+                y_margin = y_range * 0.1
+            
+            y_limits = (y_min - y_margin, y_max + y_margin)
+        
+        x_range = x_max - x_min
+        options = {
+            'title': (f'График функции: {func_str}' if len(functions) == 1
+                      else f'Графики функций: {"; ".join(functions)}'),
+            'x_limits': (x_min - x_range * 0.05, x_max + x_range * 0.05),
+            'y_limits': y_limits,
+            'log_scale': log_scale,
+            'discontinuities': list(sampling.poles),
+            'zero_asymptote': has_reciprocal,
+            'labels': functions if len(functions) > 1 else []
+        }
+        
+        info = {
+            'x_range': (x_min, x_max),
+            'type': graph_type,
+            'function': func_str,
+            'segments': len(segments),
+            'functions': len(functions),
+            'format': self.renderer.profile.extension,
+            'document': self.renderer.profile.document
+        }
+        return segments, options, info
     
     def create_graph(self, func_str: str) -> Optional[Tuple[io.BytesIO, Dict[str, Any]]]:
         """Создает график функции и возвращает его в буфере"""
+        if self.cache is not None:
+            key = self.graph_key(func_str)
+            cached = self.cache.get(key)
+            if cached is not None:
+                data, info = cached
+                return io.BytesIO(data), dict(info, function=func_str)
+        
         try:
-            x_min, x_max = self._get_x_range(func_str)
-            
-            discontinuities = self._detect_discontinuities(func_str, (x_min, x_max))
-            
-            segments = []
-            points = sorted([x_min] + discontinuities + [x_max])
-            
-            for i in range(len(points) - 1):
-                seg_start, seg_end = points[i], points[i + 1]
-                
-                if seg_end - seg_start < 0.01:
-                    continue
-                
-                seg_x = np.linspace(seg_start, seg_end, 400)
-                seg_y = []
-                valid_x = []
-                
-                for x_val in seg_x:
-                    y_val = self._safe_eval(func_str, x_val)
-                    if y_val is not None:
-                        if ('1/x' in func_str.lower() or '/x' in func_str.lower()) and abs(x_val) < 0.1:
-                            if abs(y_val) > 50:
-                                continue
-                        
-                        seg_y.append(y_val)
-                        valid_x.append(x_val)
-                
-                if len(valid_x) >= 2:
-                    segments.append((np.array(valid_x), np.array(seg_y)))
-            
-            if not segments:
-                print(f"Не удалось построить график для функции: {func_str}")
+            prepared = self.prepare(func_str)
+            if prepared is None:
                 return None
             
-            plt.figure(figsize=(10, 6), dpi=100)
-            
-            graph_type = "continuous"
-            if discontinuities:
-                graph_type = "discontinuous"
-                
-                for disc_point in discontinuities:
-                    plt.axvline(x=disc_point, color='red', linestyle='--', alpha=0.5, linewidth=1)
-            
-            for seg_x, seg_y in segments:
-                plt.plot(seg_x, seg_y, linewidth=2, color='blue', alpha=0.7)
-            
-            if '1/x' in func_str.lower() or '/x' in func_str.lower():
-                plt.axhline(y=0, color='green', linestyle='--', alpha=0.5, linewidth=1)
+            segments, options, info = prepared
+            buf = self.renderer.render(segments, **options)
             
-            plt.title(f'График функции: {func_str}', fontsize=14, pad=20)
-            plt.xlabel('x', fontsize=12)
-            plt.ylabel('f(x)', fontsize=12)
-            plt.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
-            plt.axhline(y=0, color='black', linewidth=0.8)
-            plt.axvline(x=0, color='black', linewidth=0.8)
+            if self.cache is not None:
+                self.cache.put(key, buf.getvalue(), info)
             
-            all_y = []
-            for _, seg_y in segments:
-                all_y.extend(seg_y)
-            
-            if all_y:
-                y_min, y_max = min(all_y), max(all_y)
-                y_range = y_max - y_min
-                
-                if y_range > 100 and ('exp' in func_str.lower() or 'e^' in func_str.lower()):
-                    plt.yscale('log')
-                    plt.ylabel('f(x) (log scale)', fontsize=12)
-                else:
-                    if y_range < 0.1:
-                        y_margin = 0.5
-                    elif y_range < 10:
-                        y_margin = y_range * 0.2
-                    else:
-                        y_margin = y_range * 0.1
-                    
-                    plt.ylim(y_min - y_margin, y_max + y_margin)
-            
-            x_range = x_max - x_min
-            plt.xlim(x_min - x_range * 0.05, x_max + x_range * 0.05)
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight', dpi=100, 
-                       facecolor='white', edgecolor='none')
-            buf.seek(0)
-            plt.close()
-            
-            info = {
-                'x_range': (x_min, x_max),
-                'type': graph_type,
-                'function': func_str,
-                'segments': len(segments)
-            }
-            
-            print(f"График для функции '{func_str}' успешно построен")
+            logger.debug(f"График для функции '{func_str}' построен")
             return buf, info
             
+        except ExpressionError as e:
+            logger.info(f"Некорректная функция '{func_str}': {e}")
+            return None
         except Exception as e:
-            print(f"Ошибка при построении графика для '{func_str}': {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Ошибка при построении графика для '{func_str}': {e}")
             return None
     
     def quick_test(self):
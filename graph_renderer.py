@@ -0,0 +1,201 @@
+import io
+import queue
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+import metrics
+
+# Цвета линий по порядку функций на одном графике
+SERIES_COLORS = ('blue', 'darkorange', 'green', 'purple', 'brown', 'magenta')
+
+
+class OutputProfile(NamedTuple):
+    """Формат изображения графика.
+
+    colors > 0 — PNG с палитрой из стольких цветов; quality — качество
+    WebP/JPEG; document — отправлять файлом, а не фотографией.
+    """
+    name: str
+    format: str
+    dpi: int
+    quality: int = 0
+    colors: int = 0
+    document: bool = False
+
+    @property
+    def extension(self) -> str:
+        return 'jpg' if self.format == 'jpeg' else self.format
+
+
+PROFILES = {
+    'png': OutputProfile('png', 'png', 100),
+    'png8': OutputProfile('png8', 'png', 100, colors=64),
+    'webp': OutputProfile('webp', 'webp', 100, quality=80),
+    'jpeg': OutputProfile('jpeg', 'jpeg', 100, quality=85),
+    'preview': OutputProfile('preview', 'png', 60, colors=64),
+    'svg': OutputProfile('svg', 'svg', 100, document=True),
+}
+
+
+class _Template:
+    """Заранее построенная фигура: оси, сетка и подписи создаются один раз"""
+    def __init__(self, figsize: Tuple[float, float], dpi: int):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        # Постоянные поля вместо bbox_inches='tight': без лишнего прохода компоновки
+        self.figure.subplots_adjust(left=0.09, right=0.97, bottom=0.1, top=0.88)
+
+        ax = self.figure.add_subplot()
+        ax.set_xlabel('x', fontsize=12)
+        ax.set_ylabel('f(x)', fontsize=12)
+        ax.grid(True, alpha=0.3, linestyle='-', linewidth=0.5)
+        ax.axhline(y=0, color='black', linewidth=0.8)
+        ax.axvline(x=0, color='black', linewidth=0.8)
+
+        self.ax = ax
+        self.title = ax.set_title('', fontsize=14, pad=20)
+        self.asymptote = ax.axhline(y=0, color='green', linestyle='--', alpha=0.5, linewidth=1)
+        self.lines = []
+        self.markers = []
+
+    def _take(self, pool: list, count: int, factory) -> list:
+        while len(pool) < count:
+            pool.append(factory())
+        for i, artist in enumerate(pool):
+            artist.set_visible(i < count)
+        return pool[:count]
+
+    def update(self, segments: Sequence[tuple], title: str,
+               x_limits: Tuple[float, float], y_limits: Optional[Tuple[float, float]],
+               log_scale: bool, discontinuities: Iterable[float], zero_asymptote: bool,
+               labels: Sequence[str]):
+        ax = self.ax
+        discontinuities = list(discontinuities)
+
+        lines = self._take(
+            self.lines, len(segments),
+            lambda: ax.plot([], [], linewidth=2, color='blue', alpha=0.7)[0]
+        )
+        legend_handles = {}
+        for line, segment in zip(lines, segments):
+            seg_x, seg_y = segment[0], segment[1]
+            series = segment[2] if len(segment) > 2 else 0
+            line.set_data(seg_x, seg_y)
+            line.set_color(SERIES_COLORS[series % len(SERIES_COLORS)])
+            legend_handles.setdefault(series, line)
+
+        if labels:
+            handles = [legend_handles[i] for i in range(len(labels)) if i in legend_handles]
+            names = [labels[i] for i in range(len(labels)) if i in legend_handles]
+            ax.legend(handles, names, loc='best', fontsize=10)
+        elif ax.get_legend() is not None:
+            ax.get_legend().remove()
+
+        markers = self._take(
+            self.markers, len(discontinuities),
+            lambda: ax.axvline(x=0, color='red', linestyle='--', alpha=0.5, linewidth=1)
+        )
+        for marker, point in zip(markers, discontinuities):
+            marker.set_xdata([point, point])
+
+        self.asymptote.set_visible(zero_asymptote)
+        self.title.set_text(title)
+
+        if log_scale:
+            ax.set_yscale('log')
+            ax.set_ylabel('f(x) (log scale)', fontsize=12)
+        else:
+            ax.set_yscale('linear')
+            ax.set_ylabel('f(x)', fontsize=12)
+
+        if y_limits is not None:
+            ax.set_ylim(*y_limits)
+        else:
+            # Шаблон переиспользуется: пределы предыдущего графика сбрасываются
+            ax.relim()
+            ax.autoscale(axis='y')
+
+        ax.set_xlim(*x_limits)
+
+
+class GraphRenderer:
+    """Рендерер графиков на объектном API matplotlib (без pyplot).
+
+    Держит пул готовых шаблонов фигур; каждый поток берёт свободный шаблон,
+    обновляет данные линий, пределы и заголовок и сохраняет изображение.
+    Один шаблон никогда не используется двумя потоками одновременно.
+    """
+    def __init__(self, figsize: Tuple[float, float] = (10, 6), profile: OutputProfile = PROFILES['png8'],
+                 max_templates: int = 4):
+        self.figsize = figsize
+        self.profile = profile
+        self.max_templates = max_templates
+        self._free: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Template:
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_templates:
+                self._created += 1
+                return _Template(self.figsize, self.profile.dpi)
+
+        return self._free.get()
+
+    def render(self, segments: List[tuple], title: str,
+               x_limits: Tuple[float, float], y_limits: Optional[Tuple[float, float]] = None,
+               log_scale: bool = False, discontinuities: Iterable[float] = (),
+               zero_asymptote: bool = False, labels: Sequence[str] = ()) -> io.BytesIO:
+        """Рисует сегменты графика и возвращает изображение в формате profile в буфере.
+
+        Сегмент — (x, y) или (x, y, номер функции); при нескольких функциях
+        цвет линии берётся по номеру, а labels задают подписи легенды.
+        """
+        template = self._acquire()
+        try:
+            template.update(segments, title, x_limits, y_limits, log_scale, discontinuities,
+                            zero_asymptote, labels)
+
+            started = time.perf_counter()
+            buf = self._encode(template.figure, self.profile)
+            metrics.IMAGE_ENCODE_SECONDS.observe(self.profile.name, time.perf_counter() - started)
+            metrics.IMAGE_BYTES.observe(self.profile.name, buf.getbuffer().nbytes)
+            buf.seek(0)
+            return buf
+        finally:
+            self._free.put(template)
+
+    @staticmethod
+    def _encode(figure: Figure, profile: OutputProfile) -> io.BytesIO:
+        """Растеризует фигуру один раз и кодирует её через Pillow; SVG — векторно"""
+        buf = io.BytesIO()
+        if profile.format == 'svg':
+            figure.savefig(buf, format='svg', facecolor='white', edgecolor='none')
+            return buf
+
+        figure.set_dpi(profile.dpi)
+        canvas = figure.canvas
+        canvas.draw()
+        image = Image.frombuffer('RGBA', canvas.get_width_height(), canvas.buffer_rgba(),
+                                 'raw', 'RGBA', 0, 1).convert('RGB')
+
+        if profile.format == 'png':
+            if profile.colors:
+                image = image.quantize(profile.colors, method=Image.Quantize.FASTOCTREE,
+                                       dither=Image.Dither.NONE)
+            image.save(buf, format='PNG')
+        elif profile.format == 'jpeg':
+            image.save(buf, format='JPEG', quality=profile.quality)
+        else:
+            image.save(buf, format='WEBP', quality=profile.quality)
+        return buf
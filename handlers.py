@@ -1,14 +1,24 @@
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes
+from telegram.error import BadRequest
 from datetime import datetime
 import pytz
 import io
+import math
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 
+import config
 import database
-from keyboards import get_main_keyboard, get_calc_keyboard, get_graph_keyboard
+import metrics
+from profiling import PROFILER
+from keyboards import GRAPH_PRESETS, get_main_keyboard, get_calc_keyboard, get_graph_keyboard
 from services import Services
 from message_formatter import MessageFormatter
 
+logger = logging.getLogger(__name__)
+
 class Handlers:
     def __init__(self, bot_instance):
         self.bot = bot_instance
@@ -35,8 +45,8 @@ class Handlers:
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         
-        if user.id in self.bot.user_data:
-            self.bot.user_data[user.id] = {'mode': 'main'}
+        if user.id in self.bot.sessions:
+            self.bot.sessions.reset(user.id)
         
         await update.message.reply_text(
             f"Привет, {user.first_name}! 👋\nЯ бот-помощник по математике.\n\n"
@@ -74,10 +84,12 @@ class Handlers:
     • /graph x^2
     • /graph sin(x)*cos(x)
     • /graph exp(-x^2/2)
+    • /graph sin(x); cos(x) — несколько функций на одном графике
 
 /calc &lt;выражение&gt; - Калькулятор
     Пример:
     • /calc 2+2*2
+    Несколько выражений — каждое с новой строки.
 
 <b>Или используйте кнопки на клавиатуре!</b> ⬇️
             """
@@ -91,7 +103,7 @@ class Handlers:
     async def solve_equation_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Начало режима решения уравнений"""
         user_id = update.effective_user.id
-        self.bot.user_data[user_id] = {'mode': 'solve'}
+        self.bot.sessions.reset(user_id, 'solve')
         
         await update.message.reply_text(
             "🧮 <b>Решатель уравнений</b>\n\n"
@@ -120,8 +132,51 @@ class Handlers:
         equation = ' '.join(context.args)
         await self._solve_equation(update, equation)
     
+    async def _admit(self, update: Update) -> bool:
+        """Проверяет лимит тяжёлых запросов пользователя и сообщает об отказе"""
+        retry_after = self.bot.scheduler.admit(update.effective_user.id)
+        if retry_after is None:
+            return True
+        
+        await update.message.reply_text(
+            f"🚦 Слишком много запросов. Попробуйте через {math.ceil(retry_after)} с."
+        )
+        return False
+    
+    @asynccontextmanager
+    async def _heavy_slot(self, update: Update):
+        """Место в очереди тяжёлых задач; если нужно ждать — сообщает позицию"""
+        async def notify(position: int):
+            await update.message.reply_text(f"⏳ Запрос в очереди, позиция {position}")
+        
+        async with self.bot.scheduler.slot(update.effective_user.id, notify):
+            yield
+    
+    def _start_job(self, update: Update, kind: str, text: str, coroutine):
+        """Запускает тяжёлую задачу отдельно от обработчика.
+        
+        Обработчик сразу освобождает очередь обновлений пользователя, поэтому
+        новый запрос того же вида успевает отменить предыдущий, ещё не завершённый.
+        text — ввод задачи, он сохраняется вместе с медленным запросом.
+        """
+        user_id = update.effective_user.id
+        name = f"{kind}_job"
+        task = self.bot.application.create_task(
+            metrics.measure(name, PROFILER.measure(name, text, user_id, coroutine), user_id),
+            update=update,
+            name=f"{kind}:{user_id}"
+        )
+        if self.bot.scheduler.track(user_id, kind, task):
+            logger.info(f"Отменена предыдущая задача {kind} пользователя {user_id}")
+    
     async def _solve_equation(self, update: Update, equation: str):
         """Решение уравнения"""
+        if not await self._admit(update):
+            return
+        
+        self._start_job(update, 'solve', equation, self._solve_job(update, equation))
+    
+    async def _solve_job(self, update: Update, equation: str):
         user_id = update.effective_user.id
         
         try:
@@ -130,7 +185,8 @@ class Handlers:
                 "Пожалуйста, подождите..."
             )
             
-            result = self.services.solver.solve(equation)
+            async with self._heavy_slot(update):
+                result = await self.services.solver_pool.solve(equation)
             
             if result['error']:
                 await update.message.reply_text(result['error_message'], parse_mode='HTML')
@@ -149,8 +205,9 @@ class Handlers:
                 reply_markup=get_main_keyboard()
             )
             
-            if user_id in self.bot.user_data:
-                self.bot.user_data[user_id]['mode'] = 'main'
+            session = self.bot.sessions.get(user_id)
+            if session is not None:
+                session.mode = 'main'
                 
         except Exception as e:
             await update.message.reply_text(f"❌ Ошибка: {str(e)[:200]}")
@@ -158,11 +215,12 @@ class Handlers:
     async def graph_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Начало режима построения графиков"""
         user_id = update.effective_user.id
-        self.bot.user_data[user_id] = {'mode': 'graph', 'function': ''}
+        self.bot.sessions.reset(user_id, 'graph')
         
         await update.message.reply_text(
             "📊 <b>Построитель графиков</b>\n\n"
             "Введите функцию для построения графика.\n"
+            "Несколько функций на одном графике — через ';', например: sin(x); cos(x)\n"
             "Или выберите пример из кнопок ниже.\n\n"
             "Для возврата нажмите '⬅️ Назад'.",
             parse_mode='HTML',
@@ -183,26 +241,13 @@ class Handlers:
         user_id = update.effective_user.id
         text = update.message.text
         
-        if user_id not in self.bot.user_data:
-            self.bot.user_data[user_id] = {'mode': 'graph', 'function': ''}
-        
-        examples = {
-            "x^2": "x**2",
-            "sin(x)": "sin(x)",
-            "cos(x)": "cos(x)",
-            "e^x": "exp(x)",
-            "ln(x)": "log(x)",
-            "√(x)": "sqrt(x)",
-            "1/x": "1/x",
-            "|x|": "abs(x)",
-            "x^3": "x**3"
-        }
+        session = self.bot.sessions.get_or_create(user_id, 'graph')
         
-        if text in examples:
-            self.bot.user_data[user_id]['function'] = examples[text]
+        if text in GRAPH_PRESETS:
+            session.function = GRAPH_PRESETS[text]
             func_display = text
         else:
-            self.bot.user_data[user_id]['function'] = text
+            session.function = text
             func_display = text
         
         await update.message.reply_text(
@@ -217,14 +262,16 @@ class Handlers:
         """Построение графика"""
         user_id = update.effective_user.id
         
-        if user_id not in self.bot.user_data or 'function' not in self.bot.user_data[user_id]:
+        session = self.bot.sessions.get(user_id)
+        
+        if session is None:
             await update.message.reply_text(
                 "❌ Сначала введите функцию",
                 reply_markup=get_graph_keyboard()
             )
             return
         
-        func_str = self.bot.user_data[user_id]['function']
+        func_str = session.function
         
         if not func_str:
             await update.message.reply_text(
@@ -233,15 +280,23 @@ class Handlers:
             )
             return
         
+        if not await self._admit(update):
+            return
+        
+        self._start_job(update, 'graph', func_str, self._graph_draw_job(update, func_str))
+    
+    async def _graph_draw_job(self, update: Update, func_str: str):
+        user_id = update.effective_user.id
+        
         try:
             await update.message.reply_text(
                 f"📈 Строю график функции: {func_str}\n"
                 "Пожалуйста, подождите..."
             )
             
-            result = self.services.plotter.create_graph(func_str)
+            sent = await self._send_graph(update, func_str, reply_markup=get_graph_keyboard())
             
-            if result is None:
+            if not sent:
                 await update.message.reply_text(
                     "❌ Не удалось построить график.\n"
                     "Проверьте правильность функции.",
@@ -249,20 +304,6 @@ class Handlers:
                 )
                 return
             
-            buf, info = result
-            caption = self.formatter.format_graph_info(
-                func_str, 
-                info['x_range'], 
-                info['type']
-            )
-            
-            await update.message.reply_photo(
-                photo=buf,
-                caption=caption,
-                parse_mode='HTML',
-                reply_markup=get_graph_keyboard()
-            )
-            
             database.log_message(
                 user_id,
                 f"graph: {func_str}",
@@ -275,28 +316,95 @@ class Handlers:
                 reply_markup=get_graph_keyboard()
             )
     
+    async def _send_graph(self, update: Update, func_str: str, reply_markup=None) -> bool:
+        """Отправляет график, повторно используя file_id уже загруженного изображения"""
+        plotter = self.services.plotter
+        cache = self.services.graph_cache
+        key = plotter.graph_key(func_str)
+        
+        cached = cache.get_file_id(key)
+        if cached is not None:
+            file_id, info = cached
+            try:
+                await self._reply_graph(
+                    update, file_id, info,
+                    self.formatter.format_graph_info(func_str, info['x_range'], info['type']),
+                    reply_markup
+                )
+                return True
+            except BadRequest:
+                cache.drop_file_id(key)
+        
+        bank = self.services.render_bank
+        banked = bank.get(key) if bank is not None else None
+        if banked is not None:
+            # Пресет уже отрисован в банке — отправляем без вычислений
+            data, info = banked
+            result = data, dict(info, function=func_str)
+        else:
+            async with self._heavy_slot(update):
+                render = asyncio.ensure_future(
+                    asyncio.to_thread(PROFILER.call, plotter.create_graph, func_str)
+                )
+                try:
+                    result = await asyncio.shield(render)
+                except asyncio.CancelledError:
+                    # Поток отрисовки не прервать: место держим, пока он не закончит,
+                    # иначе HEAVY_JOBS не ограничивал бы число одновременных отрисовок
+                    await asyncio.wait([render])
+                    raise
+        
+        if result is None:
+            return False
+        
+        buf, info = result
+        caption = self.formatter.format_graph_info(
+            func_str, 
+            info['x_range'], 
+            info['type']
+        )
+        
+        message = await self._reply_graph(update, buf, info, caption, reply_markup)
+        
+        if message.photo:
+            cache.set_file_id(key, message.photo[-1].file_id, info)
+        elif message.document:
+            cache.set_file_id(key, message.document.file_id, info)
+        
+        return True
+    
+    async def _reply_graph(self, update: Update, media, info: dict, caption: str, reply_markup=None):
+        """Отправляет график фотографией или, для векторных форматов, файлом"""
+        if info.get('document'):
+            return await update.message.reply_document(
+                document=media,
+                filename=f"graph.{info.get('format', 'svg')}",
+                caption=caption,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        return await update.message.reply_photo(
+            photo=media,
+            caption=caption,
+            parse_mode='HTML',
+            reply_markup=reply_markup
+        )
+    
     async def _draw_graph(self, update: Update, func_str: str):
         """Внутренняя функция построения графика"""
+        if not await self._admit(update):
+            return
+        
+        self._start_job(update, 'graph', func_str, self._draw_graph_job(update, func_str))
+    
+    async def _draw_graph_job(self, update: Update, func_str: str):
         try:
-            result = self.services.plotter.create_graph(func_str)
+            sent = await self._send_graph(update, func_str)
             
-            if result is None:
+            if not sent:
                 await update.message.reply_text("❌ Не удалось построить график")
                 return
             
-            buf, info = result
-            caption = self.formatter.format_graph_info(
-                func_str, 
-                info['x_range'], 
-                info['type']
-            )
-            
-            await update.message.reply_photo(
-                photo=buf,
-                caption=caption,
-                parse_mode='HTML'
-            )
-            
             database.log_message(
                 update.effective_user.id, 
                 f"graph: {func_str}", 
@@ -309,7 +417,7 @@ class Handlers:
     async def calc_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Начало режима калькулятора"""
         user_id = update.effective_user.id
-        self.bot.user_data[user_id] = {'mode': 'calc', 'expression': ''}
+        self.bot.sessions.reset(user_id, 'calc')
         
         await update.message.reply_text(
             "🔢 <b>Калькулятор</b>\n\n"
@@ -326,6 +434,11 @@ class Handlers:
             await self.calc_start(update, context)
             return
         
+        lines = self._split_lines(update.message.text.split(maxsplit=1)[1])
+        if len(lines) > 1:
+            await self._calc_batch(update, lines)
+            return
+        
         expression = ' '.join(context.args)
         
         try:
@@ -338,15 +451,43 @@ class Handlers:
         except Exception as e:
             await update.message.reply_text(f"❌ Ошибка: {str(e)[:100]}")
     
+    @staticmethod
+    def _split_lines(text: str) -> list:
+        return [line.strip() for line in text.splitlines() if line.strip()]
+    
+    async def _calc_batch(self, update: Update, lines: list, reply_markup=None):
+        """Вычисляет несколько выражений (по одному в строке) и отвечает одной таблицей"""
+        try:
+            rows, skipped = PROFILER.call(
+                self.services.calculator.evaluate_batch,
+                lines,
+                max_lines=config.CALC_BATCH_MAX_LINES,
+                time_limit=config.CALC_BATCH_TIME_LIMIT
+            )
+            
+            await update.message.reply_text(
+                self.formatter.format_calculation_table(rows, skipped),
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+            
+            database.log_command(update.effective_user.id, "calc", f"{len(rows)} выражений")
+            
+        except Exception as e:
+            await update.message.reply_text(f"❌ Ошибка: {str(e)[:100]}", reply_markup=reply_markup)
+    
     async def calc_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка ввода в калькуляторе"""
         user_id = update.effective_user.id
         text = update.message.text
         
-        if user_id not in self.bot.user_data:
-            self.bot.user_data[user_id] = {'mode': 'calc', 'expression': ''}
+        lines = self._split_lines(text)
+        if len(lines) > 1:
+            await self._calc_batch(update, lines, reply_markup=get_calc_keyboard())
+            return
         
-        expression = self.bot.user_data[user_id].get('expression', '')
+        session = self.bot.sessions.get_or_create(user_id, 'calc')
+        expression = session.expression
         
         if text == '⌫' and expression:
             expression = expression[:-1]
@@ -367,7 +508,7 @@ class Handlers:
         elif text == 'pi':
             expression += 'pi'
         
-        self.bot.user_data[user_id]['expression'] = expression
+        session.expression = expression
         
         if expression:
             await update.message.reply_text(
@@ -385,14 +526,16 @@ class Handlers:
         """Вычисление выражения в калькуляторе"""
         user_id = update.effective_user.id
         
-        if user_id not in self.bot.user_data:
+        session = self.bot.sessions.get(user_id)
+        
+        if session is None:
             await update.message.reply_text(
                 "❌ Сначала запустите калькулятор",
                 reply_markup=get_main_keyboard()
             )
             return
         
-        expression = self.bot.user_data[user_id].get('expression', '')
+        expression = session.expression
         
         if not expression:
             await update.message.reply_text(
@@ -427,8 +570,9 @@ class Handlers:
     async def calc_clear(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Очистка калькулятора"""
         user_id = update.effective_user.id
-        if user_id in self.bot.user_data:
-            self.bot.user_data[user_id]['expression'] = ''
+        session = self.bot.sessions.get(user_id)
+        if session is not None:
+            session.expression = ''
         
         await update.message.reply_text(
             "🧮 Калькулятор очищен",
@@ -439,11 +583,12 @@ class Handlers:
         """Удаление последнего символа в калькуляторе"""
         user_id = update.effective_user.id
         
-        if user_id in self.bot.user_data:
-            expr = self.bot.user_data[user_id].get('expression', '')
+        session = self.bot.sessions.get(user_id)
+        
+        if session is not None:
+            expr = session.expression
             if expr:
-                self.bot.user_data[user_id]['expression'] = expr[:-1]
-                expr = self.bot.user_data[user_id]['expression']
+                session.expression = expr = expr[:-1]
                 
                 if expr:
                     await update.message.reply_text(
@@ -502,9 +647,52 @@ class Handlers:
         )
         database.log_command(update.effective_user.id, "time")
     
+    async def profile(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Управление профилированием (только для администраторов).
+        
+        /profile — состояние, /profile on [доля запросов], /profile off
+        """
+        user_id = update.effective_user.id
+        if user_id not in config.ADMIN_IDS:
+            await update.message.reply_text("⛔ Команда доступна только администраторам")
+            return
+        
+        args = context.args or []
+        if args and args[0] == 'on':
+            if len(args) > 1:
+                try:
+                    PROFILER.sample_rate = min(1.0, max(0.0, float(args[1])))
+                except ValueError:
+                    await update.message.reply_text("❌ Доля запросов — число от 0 до 1")
+                    return
+            PROFILER.enabled = True
+        elif args and args[0] == 'off':
+            PROFILER.enabled = False
+        elif args:
+            await update.message.reply_text("Использование: /profile [on [доля] | off]")
+            return
+        
+        state = "включено" if PROFILER.enabled else "выключено"
+        await update.message.reply_text(
+            f"🔬 Профилирование: <b>{state}</b>\n"
+            f"Доля профилируемых запросов: {PROFILER.sample_rate:g}\n"
+            f"Порог медленного запроса: {PROFILER.slow_seconds:g} с\n"
+            f"Сохранено запросов: {PROFILER.saved_count()} (в {PROFILER.directory}/)",
+            parse_mode='HTML'
+        )
+        database.log_command(user_id, "profile", ' '.join(args))
+    
     async def stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        stats = database.get_stats()
+        try:
+            stats = await database.get_stats_async()
+        except (asyncio.TimeoutError, RuntimeError) as e:
+            logger.error(f"Статистика недоступна: {e!r}")
+            await update.message.reply_text(
+                "❌ Статистика временно недоступна, попробуйте позже",
+                reply_markup=get_main_keyboard()
+            )
+            return
         
         stats_text = f"""
 📊 <b>Статистика бота:</b>
@@ -532,8 +720,9 @@ class Handlers:
     async def back_to_main(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Возврат в главное меню"""
         user_id = update.effective_user.id
-        if user_id in self.bot.user_data:
-            self.bot.user_data[user_id]['mode'] = 'main'
+        session = self.bot.sessions.get(user_id)
+        if session is not None:
+            session.mode = 'main'
         
         await update.message.reply_text(
             "<b>Главное меню:</b>\n\nВыберите действие на клавиатуре ниже ⬇️",
@@ -550,8 +739,10 @@ class Handlers:
             await self.button_actions[text](update, context)
             return
         
-        if user_id in self.bot.user_data:
-            mode = self.bot.user_data[user_id].get('mode', 'main')
+        session = self.bot.sessions.get(user_id)
+        
+        if session is not None:
+            mode = session.mode
             
             if mode == 'solve':
                 await self._solve_equation(update, text)
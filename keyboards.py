@@ -22,6 +22,19 @@ def get_calc_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
+# Примеры функций на клавиатуре графика: подпись кнопки -> функция
+GRAPH_PRESETS = {
+    "x^2": "x**2",
+    "sin(x)": "sin(x)",
+    "cos(x)": "cos(x)",
+    "e^x": "exp(x)",
+    "ln(x)": "log(x)",
+    "√(x)": "sqrt(x)",
+    "1/x": "1/x",
+    "|x|": "abs(x)",
+    "x^3": "x**3"
+}
+
 def get_graph_keyboard():
     """Клавиатура графика"""
     keyboard = [
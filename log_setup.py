@@ -0,0 +1,116 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Поля, которые можно передать через extra= и которые попадут в JSON-запись
+EXTRA_FIELDS = ('user', 'command', 'duration', 'status', 'shard')
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-запись на строку: время, уровень, логгер, сообщение и поля из extra"""
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Кладёт запись в очередь, сохраняя трассировку отдельно от текста сообщения"""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(path: str = 'bot.log', level: str = 'INFO', max_bytes: int = 10 * 1024 * 1024,
+                  backups: int = 5, rotate_when: str = '', json_file: bool = True) -> logging.handlers.QueueListener:
+    """Настраивает неблокирующее журналирование.
+
+    Логгеры только кладут записи в очередь; запись в консоль и в файл
+    выполняет фоновый поток. Файл ротируется по размеру или, если задан
+    rotate_when (например, 'midnight'), по времени.
+    """
+    if rotate_when:
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=rotate_when, backupCount=backups, encoding='utf-8'
+        )
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8'
+        )
+    file_handler.setFormatter(JsonFormatter() if json_file else logging.Formatter(TEXT_FORMAT))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class PipeHandler(logging.Handler):
+    """Передаёт подготовленные записи по каналу multiprocessing в другой процесс"""
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.conn.send(record)
+        except Exception:
+            self.handleError(record)
+
+
+def setup_process_logging(conn, level: str = 'INFO', shard: int = None) -> logging.handlers.QueueListener:
+    """Журналирование дочернего процесса: записи уходят по каналу conn в основной процесс.
+
+    Файл журнала пишет только основной процесс, поэтому ротация остаётся
+    безопасной при нескольких процессах.
+    """
+    queue_handler = _QueueHandler(queue.SimpleQueue())
+    if shard is not None:
+        queue_handler.addFilter(lambda record: setattr(record, 'shard', shard) or True)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, PipeHandler(conn))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,3 +1,8 @@
+import html
+
+# Максимальная длина сообщения Telegram
+MESSAGE_LIMIT = 4096
+
 class MessageFormatter:
     def __init__(self):
         pass
@@ -41,20 +46,68 @@ class MessageFormatter:
             
             return f"📌 Уравнение: <b>{equation}</b>\n\n✅ Найдено решений: <b>{count}</b>\n\n{solutions_block}"
     
-    def format_calculation_result(self, expression: str, result) -> str:
-        """Форматирует результат вычисления"""
+    def _format_number(self, result) -> str:
         if isinstance(result, str):
-            result_str = result
+            return result
         elif isinstance(result, (int, float)):
             if result == int(result):
-                result_str = str(int(result))
-            else:
-                result_str = f"{result:.10f}".rstrip('0').rstrip('.')
-        else:
-            result_str = str(result)
+                return str(int(result))
+            return f"{result:.10f}".rstrip('0').rstrip('.')
+        return str(result)
+    
+    def format_calculation_result(self, expression: str, result) -> str:
+        """Форматирует результат вычисления"""
+        result_str = self._format_number(result)
         
         return f"🧮 Выражение: <code>{expression}</code>\n\n✅ Результат: <b>{result_str}</b>"
     
+    def format_calculation_table(self, rows: list, skipped: int = 0) -> str:
+        """Форматирует результаты нескольких выражений одной таблицей.
+
+        Строки, не помещающиеся в одно сообщение Telegram, отбрасываются
+        с пометкой, сколько их осталось.
+        """
+        if not rows:
+            return "🧮 <b>Вычисления</b>\n\n❌ Нет выражений для вычисления"
+        
+        lines = []
+        for expression, result, error in rows:
+            if len(expression) > 40:
+                expression = expression[:39] + '…'
+            value = f"❌ {error}" if error else self._format_number(result)
+            lines.append((expression, value))
+        
+        width = max(len(expression) for expression, _ in lines)
+        table_lines = [
+            f"{html.escape(expression.ljust(width))} = {html.escape(value[:80])}"
+            for expression, value in lines
+        ]
+        
+        errors = sum(1 for _, _, error in rows if error)
+        summary = f"✅ Вычислено: <b>{len(rows) - errors}</b>"
+        if errors:
+            summary += f", ошибок: <b>{errors}</b>"
+        if skipped:
+            summary += f"\n⚠️ Пропущено (лимит строк или времени): <b>{skipped}</b>"
+        
+        header = "🧮 <b>Вычисления</b>\n\n<pre>"
+        footer = f"</pre>\n\n{summary}"
+        # Запас под строку «…ещё N строк», если таблица не поместится
+        budget = MESSAGE_LIMIT - len(header) - len(footer) - 30
+        shown = 0
+        used = 0
+        for line in table_lines:
+            if used + len(line) + 1 > budget:
+                break
+            used += len(line) + 1
+            shown += 1
+        
+        table = "\n".join(table_lines[:shown])
+        if shown < len(table_lines):
+            table += f"\n…ещё {len(table_lines) - shown} строк"
+        
+        return f"{header}{table}{footer}"
+    
     def format_graph_info(self, func_str: str, x_range: tuple, graph_type: str) -> str:
         """Форматирует информацию о графике"""
         range_text = f"от {x_range[0]} до {x_range[1]}"
@@ -64,7 +117,14 @@ class MessageFormatter:
         else:
             type_text = "Непрерывная функция"
         
-        return f"📊 График функции:\n<b>{func_str}</b>\n\n📏 Диапазон x: {range_text}\n📋 Тип: {type_text}"
+        functions = [part.strip() for part in func_str.split(';') if part.strip()]
+        if len(functions) > 1:
+            header = "📊 Графики функций:\n" + "\n".join(f"<b>{f}</b>" for f in functions)
+            type_text = "Есть разрывы" if graph_type == "discontinuous" else "Непрерывные функции"
+        else:
+            header = f"📊 График функции:\n<b>{func_str}</b>"
+        
+        return f"{header}\n\n📏 Диапазон x: {range_text}\n📋 Тип: {type_text}"
     
     def format_error_message(self, error: str, context: str = "") -> str:
         """Форматирует сообщение об ошибке"""
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger('access')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Гистограмма задержек с метками в формате Prometheus"""
+    def __init__(self, name: str, help_text: str, label: str, buckets: Sequence[float] = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                # счётчики по корзинам, затем сумма и общее число наблюдений
+                series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+
+        for value, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{self.label}="{value}"}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    """Счётчик с меткой в формате Prometheus"""
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: int = 1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f'{self.name}{{{self.label}="{value}"}} {count}' for value, count in items)
+        return lines
+
+
+HANDLER_SECONDS = Histogram(
+    'math_bot_handler_seconds', 'Время обработки команды', 'handler'
+)
+HANDLER_ERRORS = Counter(
+    'math_bot_handler_errors_total', 'Необработанные исключения в обработчиках', 'handler'
+)
+STAGE_SECONDS = Histogram(
+    'math_bot_stage_seconds',
+    'Время этапов: parse, sympy_solve, sampling, db_write, telegram_api',
+    'stage'
+)
+IMAGE_ENCODE_SECONDS = Histogram(
+    'math_bot_image_encode_seconds', 'Время отрисовки и кодирования графика по профилям', 'profile'
+)
+IMAGE_BYTES = Histogram(
+    'math_bot_image_bytes', 'Размер изображения графика по профилям', 'profile',
+    buckets=(10_000, 20_000, 40_000, 80_000, 160_000, 320_000, 640_000, 1_280_000)
+)
+
+REGISTRY = (HANDLER_SECONDS, HANDLER_ERRORS, STAGE_SECONDS, IMAGE_ENCODE_SECONDS, IMAGE_BYTES)
+
+# Во время capture() замеры этапов собираются в список, а не в гистограмму
+_captured: Optional[List[Tuple[str, float]]] = None
+
+
+def observe_stage(stage: str, seconds: float):
+    if _captured is not None:
+        _captured.append((stage, seconds))
+    else:
+        STAGE_SECONDS.observe(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Замеряет время этапа обработки"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+@contextmanager
+def capture():
+    """Собирает замеры этапов в список, чтобы передать их из рабочего процесса"""
+    global _captured
+    previous, _captured = _captured, []
+    try:
+        yield _captured
+    finally:
+        _captured = previous
+
+
+async def measure(name: str, coroutine, user_id: Optional[int] = None):
+    """Выполняет корутину, записывая её время и необработанные ошибки под именем name.
+
+    Каждый запрос также попадает в журнал структурированной записью
+    (user, command, duration, status).
+    """
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        return await coroutine
+    except asyncio.CancelledError:
+        status = 'cancelled'
+        raise
+    except Exception:
+        status = 'error'
+        HANDLER_ERRORS.inc(name)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        HANDLER_SECONDS.observe(name, duration)
+        access_logger.info(
+            f"{name}: {status}, {duration:.3f} с",
+            extra={'user': user_id, 'command': name, 'duration': round(duration, 6), 'status': status}
+        )
+
+
+def instrument(name: str, callback):
+    """Оборачивает обработчик обновлений замером через measure"""
+    @wraps(callback)
+    async def wrapper(update, context):
+        user = getattr(update, 'effective_user', None)
+        return await measure(name, callback(update, context), user.id if user else None)
+    return wrapper
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host: str, port: int) -> Optional[ThreadingHTTPServer]:
+    """Запускает HTTP-эндпоинт /metrics в фоновом потоке"""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Не удалось запустить эндпоинт метрик на {host}:{port}: {e}")
+        return None
+
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    print(f"📈 Метрики: http://{host}:{port}/metrics")
+    return server
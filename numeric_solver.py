@@ -0,0 +1,124 @@
+import numpy as np
+from typing import Callable, List
+
+MAX_ITERATIONS = 60
+MAX_ROOTS = 10
+
+
+def initial_guesses(inner: float = 10.0, outer: float = 1000.0, count: int = 400) -> np.ndarray:
+    """Сетка начальных приближений: плотная около нуля и логарифмическая дальше"""
+    dense = np.linspace(-inner, inner, count // 2)
+    wide = np.geomspace(inner, outer, count // 2)
+    return np.concatenate([-wide[::-1], dense, wide])
+
+
+def _evaluate(func: Callable, x: np.ndarray) -> np.ndarray:
+    """Вычисляет функцию на массиве; комплексные и ошибочные значения → NaN"""
+    with np.errstate(all='ignore'):
+        y = np.asarray(func(x))
+        if np.iscomplexobj(y):
+            y = np.where(np.abs(y.imag) < 1e-12, y.real, np.nan)
+        return np.broadcast_to(y, x.shape).astype(float)
+
+
+def _newton(f: Callable, df: Callable, x: np.ndarray, tol: float) -> np.ndarray:
+    """Итерации Ньютона сразу для всего массива приближений.
+
+    Там, где производная не определена или равна нулю, шаг делается по
+    секущей через предыдущую точку. Разошедшиеся приближения становятся NaN.
+    """
+    x = x.astype(float)
+    prev_x = x + 1e-4 * (1 + np.abs(x))
+    prev_y = _evaluate(f, prev_x)
+    active = np.ones(x.shape, dtype=bool)
+
+    with np.errstate(all='ignore'):
+        for _ in range(MAX_ITERATIONS):
+            y = _evaluate(f, x)
+            slope = _evaluate(df, x)
+
+            secant = (y - prev_y) / (x - prev_x)
+            slope = np.where(np.isfinite(slope) & (slope != 0), slope, secant)
+            step = y / slope
+
+            bad = ~np.isfinite(step)
+            x_new = np.where(active & ~bad, x - step, x)
+            active &= ~bad
+
+            done = np.abs(x_new - x) <= tol * (1 + np.abs(x))
+            prev_x, prev_y = x, y
+            x = x_new
+            active &= ~done
+            if not active.any():
+                break
+
+    return np.where(np.isfinite(x), x, np.nan)
+
+
+def _bracket(f: Callable, grid: np.ndarray) -> np.ndarray:
+    """Находит смены знака на сетке и уточняет их векторизованной бисекцией"""
+    y = _evaluate(f, grid)
+    sign_change = np.isfinite(y[:-1]) & np.isfinite(y[1:]) & (np.sign(y[:-1]) * np.sign(y[1:]) < 0)
+
+    low, high = grid[:-1][sign_change], grid[1:][sign_change]
+    y_low = y[:-1][sign_change]
+
+    for _ in range(MAX_ITERATIONS):
+        mid = (low + high) / 2
+        y_mid = _evaluate(f, mid)
+        left = np.sign(y_mid) == np.sign(y_low)
+        low = np.where(left, mid, low)
+        y_low = np.where(left, y_mid, y_low)
+        high = np.where(left, high, mid)
+
+    return (low + high) / 2
+
+
+def _polish(f: Callable, roots: np.ndarray) -> np.ndarray:
+    """Округляет корни до 6 знаков, если невязка от этого не растёт (0, целые, ...)"""
+    rounded = np.round(roots, 6) + 0.0
+    better = np.abs(_evaluate(f, rounded)) <= np.abs(_evaluate(f, roots))
+    return np.where(better, rounded, roots)
+
+
+def _dedup(roots: np.ndarray, tol: float) -> np.ndarray:
+    """Схлопывает близкие корни: сортировка и один проход по разностям"""
+    if roots.size == 0:
+        return roots
+    roots = np.sort(roots)
+    keep = np.empty(roots.size, dtype=bool)
+    keep[0] = True
+    keep[1:] = np.diff(roots) > tol * (1 + np.abs(roots[1:]))
+    return roots[keep]
+
+
+def find_real_roots(f: Callable, df: Callable, guesses: np.ndarray = None,
+                    tol: float = 1e-12, residual: float = 1e-8, max_roots: int = MAX_ROOTS) -> List[float]:
+    """Численный поиск вещественных корней f(x) = 0.
+
+    f и df должны принимать массивы NumPy. Ньютон запускается сразу из всех
+    начальных приближений, смены знака на той же сетке уточняются бисекцией.
+    Учитываются только корни в пределах сетки с невязкой не больше residual;
+    они возвращаются по возрастанию, а если их больше max_roots, остаются
+    ближайшие к нулю. Если f почти всюду на сетке в пределах residual от
+    нуля (тождество), корни не возвращаются: корнем была бы любая точка.
+    """
+    grid = initial_guesses() if guesses is None else np.sort(np.asarray(guesses, dtype=float))
+
+    values = _evaluate(f, grid)
+    finite = np.isfinite(values)
+    if finite.any() and np.count_nonzero(np.abs(values[finite]) <= residual) > finite.sum() / 2:
+        return []
+
+    candidates = np.concatenate([_newton(f, df, grid, tol), _bracket(f, grid)])
+    candidates = _newton(f, df, candidates[np.isfinite(candidates)], tol)
+    candidates = candidates[np.isfinite(candidates) & (candidates >= grid[0]) & (candidates <= grid[-1])]
+    candidates = _polish(f, candidates)
+
+    roots = candidates[np.abs(_evaluate(f, candidates)) <= residual]
+    roots = _dedup(roots, 1e-7)
+
+    if roots.size > max_roots:
+        roots = np.sort(roots[np.argsort(np.abs(roots))[:max_roots]])
+
+    return [float(r) for r in roots]
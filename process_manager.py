@@ -2,12 +2,16 @@ import os
 import sys
 import signal
 import atexit
+import logging
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 class ProcessManager:
     def __init__(self, pid_file='math_bot.pid'):
         self.pid_file = Path(pid_file)
         self.pid = os.getpid()
+        self.cleanup_hooks = []
     
     def check_existing_process(self):
         if self.pid_file.exists():
@@ -15,29 +19,40 @@ class ProcessManager:
                 with open(self.pid_file, 'r') as f:
                     old_pid = int(f.read().strip())
                 
-                print(f"⚠️ Обнаружен предыдущий процесс {old_pid}")
+                logger.warning(f"⚠️ Обнаружен предыдущий процесс {old_pid}")
                 
                 try:
                     os.kill(old_pid, signal.SIGTERM)
-                    print(f"✅ Сигнал завершения отправлен")
+                    logger.info("✅ Сигнал завершения отправлен")
                 except ProcessLookupError:
-                    print(f"ℹ️ Процесс {old_pid} уже завершен")
+                    logger.info(f"ℹ️ Процесс {old_pid} уже завершен")
                 
                 self.pid_file.unlink(missing_ok=True)
                 
             except Exception as e:
-                print(f"❌ Ошибка: {e}")
+                logger.error(f"❌ Ошибка: {e}")
                 self.pid_file.unlink(missing_ok=True)
     
     def create_pid_file(self):
         try:
             with open(self.pid_file, 'w') as f:
                 f.write(str(self.pid))
-            print(f"📝 PID файл создан: {self.pid_file}")
+            logger.info(f"📝 PID файл создан: {self.pid_file}")
         except Exception as e:
-            print(f"❌ Ошибка создания PID файла: {e}")
+            logger.error(f"❌ Ошибка создания PID файла: {e}")
+    
+    def add_cleanup_hook(self, hook):
+        """Регистрирует функцию, вызываемую при завершении работы"""
+        self.cleanup_hooks.append(hook)
     
     def cleanup(self):
+        hooks, self.cleanup_hooks = self.cleanup_hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"❌ Ошибка при завершении: {e}")
+        
         if self.pid_file.exists():
             try:
                 with open(self.pid_file, 'r') as f:
@@ -45,13 +60,13 @@ class ProcessManager:
                 
                 if stored_pid == self.pid:
                     self.pid_file.unlink()
-                    print("🗑️ PID файл удален")
+                    logger.info("🗑️ PID файл удален")
             except:
                 pass
     
     def register_handlers(self):
         def signal_handler(signum, frame):
-            print(f"\n📶 Получен сигнал {signum}, завершаю работу...")
+            logger.info(f"📶 Получен сигнал {signum}, завершаю работу...")
             self.cleanup()
             sys.exit(0)
         
@@ -0,0 +1,240 @@
+import asyncio
+import cProfile
+import contextvars
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Профилировщик и tracemalloc — общие для процесса, поэтому одновременно
+# профилируется только один вызов; остальные выполняются без замеров
+_profile_lock = threading.Lock()
+
+
+def run_profiled(func, *args, top: int = 25, **kwargs) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Выполняет func под cProfile и tracemalloc.
+
+    Возвращает результат и отчёт: самые горячие функции по собственному
+    времени и пик памяти с основными местами выделения. Если профилировщик
+    уже занят другим вызовом, отчёт равен None.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return func(*args, **kwargs), None
+
+    try:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            result = profile.runcall(func, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            allocations = tracemalloc.take_snapshot().statistics('lineno')[:10]
+            if not tracing:
+                tracemalloc.stop()
+
+        stats = pstats.Stats(profile).strip_dirs()
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+        report = {
+            'function': getattr(func, '__qualname__', repr(func)),
+            'seconds': round(elapsed, 6),
+            'hot': [
+                {
+                    'function': pstats.func_std_string(key),
+                    'calls': calls,
+                    'total': round(total, 6),
+                    'cumulative': round(cumulative, 6),
+                }
+                for key, (_, calls, total, cumulative, _) in entries
+            ],
+            'memory': {
+                'peak_kb': round(peak / 1024, 1),
+                'top': [
+                    {'site': str(stat.traceback[0]), 'kb': round(stat.size / 1024, 1)}
+                    for stat in allocations
+                ],
+            },
+        }
+        return result, report
+    finally:
+        _profile_lock.release()
+
+
+class _Request:
+    __slots__ = ('name', 'text', 'user_id', 'sampled', 'reports')
+
+    def __init__(self, name: str, text: str, user_id: Optional[int], sampled: bool):
+        self.name = name
+        self.text = text
+        self.user_id = user_id
+        self.sampled = sampled
+        self.reports: List[Dict[str, Any]] = []
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar('profiling_request', default=None)
+
+
+class Profiler:
+    """Выборочное профилирование запросов и сохранение медленных.
+
+    Доля sample_rate запросов профилируется (cProfile и tracemalloc) в
+    местах, где выполняется тяжёлая работа: решение в процессе пула,
+    построение графика, пакетное вычисление. Запрос дольше slow_seconds
+    сохраняется в directory вместе с текстом ввода, именем обработчика и
+    отчётами профилировщика; старые файлы удаляются сверх max_files.
+    """
+    def __init__(self, enabled: bool = False, sample_rate: float = 0.1, slow_seconds: float = 2.0,
+                 directory: str = 'profiles', max_files: int = 200, top: int = 25):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.directory = directory
+        self.max_files = max_files
+        self.top = top
+        self._sequence = 0
+
+    def sampling(self) -> bool:
+        """Профилируется ли текущий запрос"""
+        request = _current.get()
+        return request is not None and request.sampled
+
+    async def measure(self, name: str, text: str, user_id: Optional[int], coroutine):
+        """Выполняет корутину запроса; медленный запрос сохраняется на диск"""
+        if not self.enabled:
+            return await coroutine
+
+        request = _Request(name, text, user_id, random.random() < self.sample_rate)
+        token = _current.set(request)
+        started = time.perf_counter()
+        cancelled = False
+        try:
+            return await coroutine
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.slow_seconds and not cancelled:
+                self._save(request, elapsed)
+
+    def instrument(self, name: str, callback):
+        """Оборачивает обработчик обновлений через measure"""
+        @wraps(callback)
+        async def wrapper(update, context):
+            message = getattr(update, 'effective_message', None)
+            user = getattr(update, 'effective_user', None)
+            return await self.measure(
+                name,
+                getattr(message, 'text', None) or '',
+                user.id if user else None,
+                callback(update, context)
+            )
+        return wrapper
+
+    def call(self, func, *args, **kwargs):
+        """Вызывает func, профилируя его, если текущий запрос выбран для профилирования"""
+        if not self.sampling():
+            return func(*args, **kwargs)
+
+        result, report = run_profiled(func, *args, top=self.top, **kwargs)
+        if report is not None:
+            self.attach(report)
+        return result
+
+    def attach(self, report: Dict[str, Any]):
+        """Добавляет отчёт профилировщика (например, из процесса решателя) к текущему запросу"""
+        request = _current.get()
+        if request is not None:
+            request.reports.append(report)
+
+    def saved_count(self) -> int:
+        try:
+            return sum(1 for name in os.listdir(self.directory) if name.endswith('.json'))
+        except OSError:
+            return 0
+
+    def _save(self, request: _Request, elapsed: float):
+        self._sequence += 1
+        record = {
+            'handler': request.name,
+            'text': request.text,
+            'user_id': request.user_id,
+            'seconds': round(elapsed, 6),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'sampled': request.sampled,
+            'profiles': request.reports,
+        }
+        filename = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:06d}-{request.name}.json"
+        )
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, filename), 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False, indent=1)
+            self._rotate()
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить медленный запрос: {e}")
+            return
+
+        logger.info(f"Медленный запрос {request.name} ({elapsed:.2f} с) сохранён: {filename}")
+
+    def _rotate(self):
+        files = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        for name in files[:max(0, len(files) - self.max_files)]:
+            os.remove(os.path.join(self.directory, name))
+
+
+PROFILER = Profiler()
+
+
+def replay(path: str, top: int = 25):
+    """Повторяет сохранённый медленный запрос под профилировщиком"""
+    with open(path, encoding='utf-8') as f:
+        record = json.load(f)
+
+    import config
+    handler, text = record['handler'], record['text']
+    print(f"▶️ {handler}: {text!r} (в продакшене {record['seconds']:.2f} с)")
+
+    if handler == 'solve_job':
+        from equation_solver import EquationSolver
+        solver = EquationSolver(symbolic_budget=config.SOLVER_SYMBOLIC_BUDGET)
+        func, args = solver.solve, (text,)
+    elif handler == 'graph_job':
+        from graph_plotter import GraphPlotter
+        func, args = GraphPlotter(config.GRAPH_SAMPLES).create_graph, (text,)
+    else:
+        from calculator import Calculator
+        if text.startswith('/'):
+            text = text.split(maxsplit=1)[1] if len(text.split(maxsplit=1)) > 1 else ''
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        func, args = Calculator().evaluate_batch, (lines,)
+
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    profile.runcall(func, *args)
+    print(f"⏱ Воспроизведено за {time.perf_counter() - started:.2f} с\n")
+    pstats.Stats(profile).strip_dirs().sort_stats('tottime').print_stats(top)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Использование: python profiling.py <файл медленного запроса> [число функций]")
+        sys.exit(1)
+    replay(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 25)
@@ -0,0 +1,207 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MBRBANK1'
+VERSION = 1
+# Заголовок: сигнатура и длина JSON-индекса. За индексом, с выравниванием
+# по ALIGN, идут массивы и изображения; смещения в индексе считаются от их начала
+HEADER = struct.Struct('<8sQ')
+ALIGN = 8
+
+
+def preset_functions(plotter) -> List[str]:
+    """Функции с клавиатуры графиков и стандартные функции построителя"""
+    from keyboards import GRAPH_PRESETS
+    return list(dict.fromkeys([*GRAPH_PRESETS.values(), *plotter.standard_functions]))
+
+
+def _options(plotter) -> Dict[str, Any]:
+    """Параметры отрисовки в том виде, в каком они хранятся в индексе"""
+    return json.loads(json.dumps(plotter.render_options))
+
+
+class RenderBank:
+    """Готовые графики функций-пресетов из файла, отображённого в память.
+
+    Файл содержит JSON-индекс, выбранные точки графиков (float64) и
+    закодированные изображения. Ключи — GraphPlotter.graph_key, поэтому
+    при другом профиле вывода или числе точек записи не совпадут и банк
+    нужно пересобрать. Чтение изображения — срез файла, без вычислений.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._data) < HEADER.size:
+            raise ValueError("файл банка графиков повреждён")
+        magic, length = HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise ValueError("неизвестный формат банка графиков")
+        index = json.loads(self._data[HEADER.size:HEADER.size + length])
+        self._base = HEADER.size + length + len(_pad(HEADER.size + length))
+        if index.get('version') != VERSION:
+            raise ValueError(f"неподдерживаемая версия банка графиков: {index.get('version')}")
+
+        self.options: Dict[str, Any] = index['options']
+        self._entries: Dict[str, Dict[str, Any]] = index['entries']
+        self._by_function = {entry['function']: key for key, entry in self._entries.items()}
+        for entry in self._entries.values():
+            entry['info']['x_range'] = tuple(entry['info']['x_range'])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def matches(self, plotter) -> bool:
+        """Собран ли банк с текущими параметрами отрисовки"""
+        return self.options == _options(plotter)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """Возвращает (изображение, info) или None, если графика нет в банке"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        offset, length = entry['image']
+        offset += self._base
+        return self._data[offset:offset + length], dict(entry['info'])
+
+    def prepared(self, func_str: str) -> Optional[Tuple[list, Dict[str, Any], Dict[str, Any]]]:
+        """Сегменты, параметры отрисовки и info функции, как их возвращает GraphPlotter.prepare.
+
+        Массивы — представления отображённого файла, без копирования.
+        """
+        key = self._by_function.get(func_str)
+        if key is None:
+            return None
+        entry = self._entries[key]
+        segments = []
+        for offset, count, row in entry['segments']:
+            offset += self._base
+            x = np.frombuffer(self._data, dtype='<f8', count=count, offset=offset)
+            y = np.frombuffer(self._data, dtype='<f8', count=count, offset=offset + count * 8)
+            segments.append((x, y, row))
+        return segments, dict(entry['render']), dict(entry['info'])
+
+
+def _pad(size: int) -> bytes:
+    return b'\0' * (-size % ALIGN)
+
+
+def build(path: str, plotter, functions: Iterable[str], previous: Optional[RenderBank] = None) -> int:
+    """Строит графики функций и записывает банк в path. Возвращает число графиков.
+
+    Если previous собран с тем же числом точек, точки берутся из него и
+    заново выполняется только отрисовка (например, после смены профиля вывода).
+    """
+    options = _options(plotter)
+    reuse = (previous is not None and
+             all(previous.options.get(name) == options.get(name) for name in ('samples', 'sampling')))
+
+    blobs: List[bytes] = []
+    position = 0
+    entries: Dict[str, Dict[str, Any]] = {}
+
+    def add(blob: bytes) -> int:
+        nonlocal position
+        offset = position
+        blobs.append(blob)
+        blobs.append(_pad(len(blob)))
+        position += len(blob) + len(blobs[-1])
+        return offset
+
+    for func_str in functions:
+        key = plotter.graph_key(func_str)
+        if key in entries:
+            continue
+
+        prepared = previous.prepared(func_str) if reuse else None
+        if prepared is None:
+            prepared = plotter.prepare(func_str)
+        if prepared is None:
+            continue
+        segments, render, info = prepared
+
+        image = plotter.renderer.render(segments, **render).getvalue()
+        info = dict(info, format=plotter.renderer.profile.extension,
+                    document=plotter.renderer.profile.document)
+        entries[key] = {
+            'function': func_str,
+            'info': info,
+            'render': render,
+            'segments': [
+                [add(np.ascontiguousarray(x, dtype='<f8').tobytes() +
+                     np.ascontiguousarray(y, dtype='<f8').tobytes()), len(x), row]
+                for x, y, row in segments
+            ],
+            'image': [add(image), len(image)],
+        }
+
+    index = json.dumps(
+        {'version': VERSION, 'options': options, 'entries': entries},
+        ensure_ascii=False, default=float
+    ).encode('utf-8')
+
+    # Банк может строиться одновременно несколькими процессами бота: каждый
+    # пишет во временный файл со своим pid и атомарно подменяет готовый
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(index)))
+        f.write(index)
+        f.write(_pad(HEADER.size + len(index)))
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def load_or_build(path: str, plotter, functions: Iterable[str]) -> Optional[RenderBank]:
+    """Открывает банк графиков, пересобирая его, если он отсутствует или устарел"""
+    functions = list(functions)
+    bank = None
+    try:
+        bank = RenderBank(path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Банк графиков {path} не читается, пересобираю: {e}")
+
+    if (bank is not None and bank.matches(plotter)
+            and all(plotter.graph_key(func_str) in bank for func_str in functions)):
+        logger.info(f"Банк графиков загружен: {len(bank)} графиков")
+        return bank
+
+    started = time.perf_counter()
+    try:
+        count = build(path, plotter, functions, previous=bank)
+        bank = RenderBank(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось собрать банк графиков {path}: {e}")
+        return None
+
+    logger.info(f"Банк графиков собран: {count} графиков за {time.perf_counter() - started:.2f} с")
+    return bank
+
+
+if __name__ == '__main__':
+    import config
+    from services import create_plotter
+
+    target = sys.argv[1] if len(sys.argv) > 1 else config.RENDER_BANK_PATH
+    plotter = create_plotter()
+    started = time.perf_counter()
+    count = build(target, plotter, preset_functions(plotter))
+    print(f"🗂 Банк графиков {target}: {count} графиков, {os.path.getsize(target) / 1024:.1f} KB "
+          f"за {time.perf_counter() - started:.2f} с")
@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class SchedulerBusy(Exception):
+    """Очередь тяжёлых задач переполнена"""
+
+
+class TokenBucket:
+    """Ведро токенов: capacity запросов подряд, затем rate запросов в секунду"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> Optional[float]:
+        """Забирает токен. Возвращает None или сколько секунд ждать следующего"""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class JobScheduler:
+    """Допуск и очередь тяжёлых задач (решение уравнений, построение графиков).
+
+    Частота тяжёлых запросов каждого пользователя ограничена ведром токенов,
+    одновременно выполняется не больше max_jobs задач, остальные ждут в
+    очереди с приоритетом: администраторы обслуживаются первыми, внутри
+    приоритета — по порядку поступления. Лёгкие команды через планировщик
+    не проходят и не ждут тяжёлых.
+    """
+    def __init__(self, max_jobs: int = 4, rate_per_minute: float = 10, burst: int = 5,
+                 max_queue: int = 100, admin_ids: Iterable[int] = ()):
+        self.max_jobs = max(1, max_jobs)
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_queue = max_queue
+        self.admin_ids = set(admin_ids)
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._running = 0
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._jobs: Dict[Tuple[int, str], asyncio.Task] = {}
+
+    def admit(self, user_id: int) -> Optional[float]:
+        """Проверяет лимит частоты. None — запрос допущен, иначе секунды до следующей попытки"""
+        if user_id in self.admin_ids:
+            return None
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) > 10000:
+                self._buckets = {uid: b for uid, b in self._buckets.items() if not b.is_full()}
+            bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+        return bucket.take()
+
+    def track(self, user_id: int, kind: str, task: asyncio.Task) -> bool:
+        """Запоминает задачу пользователя и отменяет его предыдущую задачу того же вида.
+
+        Возвращает True, если предыдущая задача ещё выполнялась и была отменена.
+        """
+        key = (user_id, kind)
+        previous = self._jobs.get(key)
+        self._jobs[key] = task
+        task.add_done_callback(lambda t: self._jobs.pop(key, None) if self._jobs.get(key) is t else None)
+
+        if previous is not None and not previous.done():
+            previous.cancel()
+            return True
+        return False
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def _position(self, entry: Tuple[int, int, asyncio.Future]) -> int:
+        return 1 + sum(1 for other in self._waiting if other[:2] < entry[:2])
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, on_queued: Optional[Callable[[int], Awaitable]] = None):
+        """Занимает место для тяжёлой задачи, при необходимости ожидая в очереди.
+
+        Если свободных мест нет, вызывает on_queued(позиция в очереди).
+        """
+        if self._running >= self.max_jobs or self._waiting:
+            if len(self._waiting) >= self.max_queue:
+                raise SchedulerBusy("Сервер перегружен, попробуйте позже")
+
+            priority = 0 if user_id in self.admin_ids else 1
+            entry = (priority, next(self._counter), asyncio.get_running_loop().create_future())
+            heapq.heappush(self._waiting, entry)
+
+            # Отмена возможна и во время уведомления о позиции: запись из
+            # очереди нужно убрать в обоих случаях, иначе место потеряется
+            try:
+                if on_queued is not None:
+                    try:
+                        await on_queued(self._position(entry))
+                    except Exception:
+                        pass
+                await entry[2]
+            except asyncio.CancelledError:
+                if entry[2].done() and not entry[2].cancelled():
+                    # Место уже передано этой задаче — возвращаем его следующей
+                    self._release()
+                else:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                raise
+        else:
+            self._running += 1
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        """Передаёт освободившееся место первой задаче в очереди"""
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
@@ -1,10 +1,89 @@
-from graph_plotter import GraphPlotter
+import logging
+import threading
+import time
+
+import config
+from graph_cache import GraphCache
 from calculator import Calculator
-from equation_solver import EquationSolver
+from solver_pool import SolverPool
+
+logger = logging.getLogger(__name__)
+
+
+def create_plotter(cache: GraphCache = None):
+    """Построитель графиков с профилем вывода и числом точек из конфигурации"""
+    from graph_plotter import GraphPlotter
+    from graph_renderer import PROFILES, GraphRenderer
+    profile = PROFILES.get(config.GRAPH_PROFILE)
+    if profile is None:
+        logger.warning(f"Неизвестный профиль графиков {config.GRAPH_PROFILE}, используется png8")
+        profile = PROFILES['png8']
+    if config.GRAPH_QUALITY and profile.quality:
+        profile = profile._replace(quality=config.GRAPH_QUALITY)
+    return GraphPlotter(config.GRAPH_SAMPLES, cache=cache, renderer=GraphRenderer(profile=profile))
+
 
 class Services:
-    """Контейнер сервисов бота"""
+    """Контейнер сервисов бота.
+
+    Построитель графиков (numpy и matplotlib) создаётся при первом обращении,
+    а решатель (sympy) работает только в процессах пула, поэтому импорт
+    обработчиков не тянет эти библиотеки и бот начинает отвечать на простые
+    команды сразу после запуска.
+    """
     def __init__(self):
-        self.plotter = GraphPlotter()
+        self.graph_cache = GraphCache(
+            max_bytes=int(config.GRAPH_CACHE_MB * 1024 * 1024),
+            spill_dir=config.GRAPH_CACHE_DIR or None,
+            max_disk_bytes=int(config.GRAPH_CACHE_DIR_MB * 1024 * 1024)
+        )
         self.calculator = Calculator()
-        self.solver = EquationSolver()
\ No newline at end of file
+        self.solver_pool = SolverPool(
+            config.SOLVER_WORKERS,
+            config.SOLVER_TIMEOUT,
+            cache_path=config.DATABASE_NAME,
+            cache_size=config.SOLUTION_CACHE_SIZE,
+            symbolic_budget=config.SOLVER_SYMBOLIC_BUDGET
+        )
+        # Банк готовых графиков пресетов; появляется после прогрева
+        self.render_bank = None
+        self._plotter = None
+        self._lock = threading.Lock()
+
+    @property
+    def plotter(self):
+        if self._plotter is None:
+            with self._lock:
+                if self._plotter is None:
+                    self._plotter = create_plotter(self.graph_cache)
+        return self._plotter
+
+    def warm_up(self):
+        """Загружает тяжёлые модули, строит пробный график и открывает банк графиков.
+
+        Вызывается в фоновом потоке при запуске. Решатель здесь не
+        прогревается: уравнения решаются в процессах пула, которые сами
+        импортируют sympy и решают пробное уравнение при старте. Банк
+        графиков пересобирается, если его нет или он устарел.
+        """
+        started = time.perf_counter()
+        try:
+            self.calculator.evaluate('2+2*2')
+            self.plotter.renderer.render([([0.0, 1.0], [0.0, 1.0])], 'warm-up', (0.0, 1.0))
+        except Exception as e:
+            logger.error(f"Ошибка прогрева: {e}")
+            return
+
+        if config.RENDER_BANK_PATH:
+            import render_bank
+            self.render_bank = render_bank.load_or_build(
+                config.RENDER_BANK_PATH, self.plotter, render_bank.preset_functions(self.plotter)
+            )
+
+        print(f"🔥 Прогрев завершён за {time.perf_counter() - started:.2f} с")
+
+    def start_warm_up(self) -> threading.Thread:
+        """Запускает прогрев в фоновом потоке"""
+        thread = threading.Thread(target=self.warm_up, name='warm-up', daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """Состояние пользователя: текущий режим и введённые данные"""
+    __slots__ = ('mode', 'expression', 'function', 'last_seen')
+
+    def __init__(self, mode: str = 'main', expression: str = '', function: str = '',
+                 last_seen: Optional[float] = None):
+        self.mode = mode
+        self.expression = expression
+        self.function = function
+        self.last_seen = time.time() if last_seen is None else last_seen
+
+    def size(self) -> int:
+        """Приблизительный объём памяти сессии в байтах"""
+        return (sys.getsizeof(self) + sys.getsizeof(self.mode)
+                + sys.getsizeof(self.expression) + sys.getsizeof(self.function))
+
+
+class SessionStore:
+    """Хранилище сессий с вытеснением по времени простоя и по количеству.
+
+    Сессии упорядочены по последнему обращению, поэтому устаревшие и самые
+    старые записи снимаются с начала словаря без полного обхода.
+    """
+    def __init__(self, ttl: float = 24 * 3600, max_entries: int = 100000,
+                 snapshot_path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._sessions: 'OrderedDict[int, Session]' = OrderedDict()
+        self.evicted = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._sessions))
+
+    def get(self, user_id: int) -> Optional[Session]:
+        """Возвращает активную сессию пользователя или None"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            return None
+
+        now = time.time()
+        if now - session.last_seen > self.ttl:
+            del self._sessions[user_id]
+            self.evicted += 1
+            return None
+
+        session.last_seen = now
+        self._sessions.move_to_end(user_id)
+        return session
+
+    def get_or_create(self, user_id: int, mode: str = 'main') -> Session:
+        """Возвращает сессию пользователя, создавая её при необходимости"""
+        session = self.get(user_id)
+        if session is None:
+            session = self.reset(user_id, mode)
+        return session
+
+    def reset(self, user_id: int, mode: str = 'main') -> Session:
+        """Начинает новую сессию пользователя в указанном режиме"""
+        session = Session(mode)
+        self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+        self.evict()
+        return session
+
+    def evict(self):
+        """Удаляет сессии, простаивающие дольше ttl, и лишние сверх max_entries"""
+        deadline = time.time() - self.ttl
+
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= deadline and len(self._sessions) <= self.max_entries:
+                break
+            del self._sessions[user_id]
+            self.evicted += 1
+
+    def memory_usage(self) -> int:
+        """Приблизительный объём памяти всех сессий в байтах"""
+        return sys.getsizeof(self._sessions) + sum(
+            sys.getsizeof(user_id) + session.size() for user_id, session in self._sessions.items()
+        )
+
+    def save_snapshot(self):
+        """Сохраняет сессии на диск (атомарно через временный файл)"""
+        if not self.snapshot_path:
+            return
+
+        self.evict()
+        data = {
+            str(user_id): [s.mode, s.expression, s.function, s.last_seen]
+            for user_id, s in self._sessions.items()
+        }
+        tmp_path = self.snapshot_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            logger.info(f"Сессии сохранены: {len(data)} шт.")
+        except OSError as e:
+            logger.error(f"Не удалось сохранить сессии: {e}")
+
+    def load_snapshot(self):
+        """Восстанавливает сессии, сохранённые при прошлой остановке.
+
+        Повреждённые записи и записи в другом формате пропускаются.
+        """
+        if not self.snapshot_path or not self.snapshot_path.exists():
+            return
+
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось загрузить сессии: {e}")
+            return
+
+        if not isinstance(data, dict):
+            logger.error("Не удалось загрузить сессии: неизвестный формат файла")
+            return
+
+        sessions = []
+        skipped = 0
+        for user_id, entry in data.items():
+            try:
+                mode, expression, function, last_seen = entry
+                if not all(isinstance(value, str) for value in (mode, expression, function)):
+                    raise ValueError(entry)
+                sessions.append((int(user_id), Session(mode, expression, function, float(last_seen))))
+            except (TypeError, ValueError):
+                skipped += 1
+
+        sessions.sort(key=lambda item: item[1].last_seen)
+        for user_id, session in sessions:
+            self._sessions[user_id] = session
+
+        self.evict()
+        logger.info(f"Сессии восстановлены: {len(self._sessions)} шт.")
+        if skipped:
+            logger.warning(f"Пропущено повреждённых записей сессий: {skipped}")
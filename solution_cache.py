@@ -0,0 +1,103 @@
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import sympy
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_form(expr) -> str:
+    """Каноническая запись уравнения expr = 0.
+
+    Раскрывает скобки, убирает общий числовой множитель и знак, поэтому
+    x^2-4=0, x**2 = 4 и 2*x^2 = 8 дают одну и ту же строку.
+    """
+    expr = sympy.expand(expr)
+    _, expr = expr.as_content_primitive()
+    if expr.could_extract_minus_sign():
+        expr = -expr
+    return sympy.srepr(expr)
+
+
+class SolutionCache:
+    """Двухуровневый кэш решений: LRU в памяти процесса + таблица SQLite"""
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 1024):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._memory: 'OrderedDict[str, List]' = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.db_path:
+            try:
+                self._conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+                self._conn.execute('''
+                    CREATE TABLE IF NOT EXISTS solution_cache (
+                        canonical TEXT PRIMARY KEY,
+                        solutions TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Постоянный кэш решений недоступен: {e}")
+                self._conn = None
+                self.db_path = None
+        return self._conn
+
+    def get(self, canonical: str) -> Optional[List]:
+        """Возвращает список решений или None, если уравнение не встречалось"""
+        with self._lock:
+            solutions = self._memory.get(canonical)
+            if solutions is not None:
+                self._memory.move_to_end(canonical)
+                return list(solutions)
+
+            conn = self._connection()
+            if conn is None:
+                return None
+
+            try:
+                row = conn.execute(
+                    'SELECT solutions FROM solution_cache WHERE canonical = ?', (canonical,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Ошибка чтения кэша решений: {e}")
+                return None
+
+        if row is None:
+            return None
+
+        solutions = [sympy.sympify(item) for item in json.loads(row[0])]
+        self._remember(canonical, solutions)
+        return list(solutions)
+
+    def put(self, canonical: str, solutions: List):
+        """Сохраняет решения в оба уровня кэша"""
+        self._remember(canonical, solutions)
+
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                payload = json.dumps([sympy.srepr(sol) for sol in solutions])
+                conn.execute(
+                    'INSERT OR REPLACE INTO solution_cache (canonical, solutions) VALUES (?, ?)',
+                    (canonical, payload)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Ошибка записи в кэш решений: {e}")
+
+    def _remember(self, canonical: str, solutions: List):
+        with self._lock:
+            self._memory[canonical] = list(solutions)
+            self._memory.move_to_end(canonical)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import Dict, Any, Optional, Tuple
+
+import metrics
+from profiling import PROFILER, run_profiled
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(conn, cache_path: Optional[str], cache_size: int, symbolic_budget: float):
+    """Цикл рабочего процесса: sympy импортируется один раз при старте"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from equation_solver import EquationSolver
+    from solution_cache import SolutionCache
+
+    solver = EquationSolver(cache=SolutionCache(cache_path, cache_size), symbolic_budget=symbolic_budget)
+    solver.solve('x = 0')
+    conn.send('ready')
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+
+        if request is None:
+            break
+
+        equation, profile_top = request
+        report = None
+        with metrics.capture() as stages:
+            if profile_top:
+                result, report = run_profiled(solver.solve, equation, top=profile_top)
+            else:
+                result = solver.solve(equation)
+        conn.send((result, stages, report))
+
+
+class _Worker:
+    """Рабочий процесс решателя и канал связи с ним"""
+    def __init__(self, ctx, startup_timeout: float, cache_path: Optional[str], cache_size: int,
+                 symbolic_budget: float):
+        self.startup_timeout = startup_timeout
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, cache_path, cache_size, symbolic_budget),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def call(self, equation: str, timeout: float,
+             profile_top: int = 0) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """Блокирующий вызов решателя: (результат, отчёт профилировщика) или None
+        при превышении времени.
+
+        Замеры этапов из рабочего процесса переносятся в метрики бота. Отчёт
+        есть только при profile_top > 0.
+        """
+        if not self.ready:
+            if not self.conn.poll(self.startup_timeout):
+                raise RuntimeError("рабочий процесс не запустился")
+            self.conn.recv()
+            self.ready = True
+
+        self.conn.send((equation, profile_top))
+
+        if not self.conn.poll(timeout):
+            return None
+
+        result, stages, report = self.conn.recv()
+        for stage, seconds in stages:
+            metrics.observe_stage(stage, seconds)
+        return result, report
+
+    def kill(self):
+        """Принудительно завершает процесс, не дожидаясь его.
+
+        Канал не закрывается: поток, ожидающий ответа в call, сразу
+        получает EOF и завершается.
+        """
+        if self.process.is_alive():
+            self.process.kill()
+
+    def close(self):
+        """Дожидается завершения процесса и закрывает канал"""
+        self.process.join(1)
+        self.conn.close()
+
+    def stop(self):
+        """Штатно завершает процесс"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        self.kill()
+        self.close()
+
+
+class SolverPool:
+    """Пул процессов для решения уравнений с ограничением времени"""
+    def __init__(self, size: int = 2, timeout: float = 10.0, startup_timeout: float = 60.0,
+                 cache_path: Optional[str] = None, cache_size: int = 1024, symbolic_budget: float = 0):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.symbolic_budget = symbolic_budget
+        self._ctx = multiprocessing.get_context('spawn')
+        self._workers = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._recycling = set()
+
+    def start(self):
+        """Запускает и прогревает рабочие процессы"""
+        if self._workers:
+            return
+        self._workers = [self._spawn() for _ in range(self.size)]
+        logger.info(f"Пул решателя запущен: {self.size} процесс(ов), таймаут {self.timeout} с")
+
+    def stop(self):
+        """Останавливает все рабочие процессы"""
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+        self._idle = None
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.startup_timeout, self.cache_path, self.cache_size,
+                       self.symbolic_budget)
+
+    def _replace(self, worker: _Worker) -> Optional[_Worker]:
+        """Заменяет процесс свежим (блокирующий вызов, выполняется вне цикла событий)"""
+        worker.kill()
+        worker.close()
+        new_worker = self._spawn()
+        try:
+            self._workers[self._workers.index(worker)] = new_worker
+        except ValueError:
+            # Пул уже остановлен
+            new_worker.stop()
+            return None
+        return new_worker
+
+    def _recycle(self, worker: _Worker, idle: asyncio.Queue, pending: Optional[asyncio.Future] = None):
+        """Убивает процесс и в фоне заменяет его свежим.
+
+        Ожидание завершения и запуск нового процесса блокируют, поэтому
+        выполняются в пуле потоков после того, как поток с worker.call
+        (pending) получит EOF; новый процесс возвращается в очередь свободных.
+        """
+        worker.kill()
+        task = asyncio.ensure_future(self._recycle_later(worker, idle, pending))
+        self._recycling.add(task)
+        task.add_done_callback(self._recycling.discard)
+
+    async def _recycle_later(self, worker: _Worker, idle: asyncio.Queue, pending: Optional[asyncio.Future]):
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+        try:
+            new_worker = await asyncio.get_running_loop().run_in_executor(None, self._replace, worker)
+        except Exception as e:
+            logger.error(f"Не удалось перезапустить процесс решателя: {e}")
+            return
+        if new_worker is not None and self._idle is idle:
+            idle.put_nowait(new_worker)
+
+    def _get_idle_queue(self) -> asyncio.Queue:
+        if self._idle is None:
+            self.start()
+            self._idle = asyncio.Queue()
+            for worker in self._workers:
+                self._idle.put_nowait(worker)
+        return self._idle
+
+    async def solve(self, equation: str) -> Dict[str, Any]:
+        """Решает уравнение в свободном рабочем процессе"""
+        idle = self._get_idle_queue()
+        worker = await idle.get()
+        loop = asyncio.get_running_loop()
+
+        try:
+            profile_top = PROFILER.top if PROFILER.sampling() else 0
+            call = loop.run_in_executor(None, worker.call, equation, self.timeout, profile_top)
+            reply = await asyncio.shield(call)
+        except asyncio.CancelledError:
+            # Запрос отменён: процесс занят ненужной задачей, заменяем его свежим
+            logger.info(f"Решение отменено: {equation}")
+            self._recycle(worker, idle, call)
+            raise
+        except Exception as e:
+            logger.error(f"Сбой процесса решателя: {e}")
+            self._recycle(worker, idle)
+            return self._error_result(equation, "❌ Внутренняя ошибка решателя, попробуйте ещё раз")
+
+        if reply is None:
+            logger.warning(f"Превышено время решения ({self.timeout} с): {equation}")
+            self._recycle(worker, idle)
+            return self._error_result(
+                equation,
+                f"⏱ Превышено время решения ({self.timeout:g} с).\n"
+                "Попробуйте упростить уравнение."
+            )
+
+        idle.put_nowait(worker)
+        result, report = reply
+        if report is not None:
+            PROFILER.attach(report)
+        return result
+
+    @staticmethod
+    def _error_result(equation: str, message: str) -> Dict[str, Any]:
+        return {
+            'solutions': [],
+            'equation': equation,
+            'type': 'unknown',
+            'error': True,
+            'error_message': message,
+            'count': 0
+        }
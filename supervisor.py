@@ -0,0 +1,200 @@
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from typing import List, Optional
+
+from telegram import Update
+from telegram.ext import ContextTypes, TypeHandler
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Процесс, упавший раньше этого срока после запуска, перезапускается с
+# нарастающей задержкой, чтобы не перезапускать его в цикле
+STABLE_UPTIME = 30.0
+MAX_BACKOFF = 60.0
+STOP_TIMEOUT = 30.0
+
+
+def _shard_main(index: int, updates_conn, log_conn):
+    """Точка входа процесса-шарда: полноценный бот без собственного получения обновлений"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from log_setup import setup_process_logging
+    setup_process_logging(log_conn, config.LOG_LEVEL, shard=index)
+
+    import database
+    from bot_instance import MathHelperBot
+
+    database.init_db()
+    try:
+        bot = MathHelperBot(config.TOKEN, shard=index)
+        bot.handlers.services.start_warm_up()
+        bot.run_shard(updates_conn)
+    except Exception:
+        logger.exception(f"Шард {index} завершился с ошибкой")
+        raise
+    finally:
+        database.close()
+
+
+def _forward_logs(conn):
+    """Передаёт записи журнала из шарда в журнал супервизора, пока канал открыт"""
+    while True:
+        try:
+            record = conn.recv()
+        except (EOFError, OSError):
+            return
+        logging.getLogger(record.name).handle(record)
+
+
+class _Shard:
+    """Процесс-шард и очередь обновлений для него.
+
+    Обновления отправляет отдельный поток, поэтому цикл событий супервизора
+    не блокируется на канале. Пока упавший шард перезапускается, обновления
+    копятся в очереди; теряется только то, что шард успел прочитать, но не
+    обработал.
+    """
+    def __init__(self, ctx, index: int):
+        self.ctx = ctx
+        self.index = index
+        self.pending: queue.SimpleQueue = queue.SimpleQueue()
+        self.process = None
+        self.conn = None
+        self.started = 0.0
+        self.backoff = 1.0
+        self.restart_at: Optional[float] = None
+        self.start()
+        self._sender = threading.Thread(target=self._send_loop, name=f'shard-{index}-sender', daemon=True)
+        self._sender.start()
+
+    def start(self):
+        updates_reader, updates_writer = self.ctx.Pipe(duplex=False)
+        log_reader, log_writer = self.ctx.Pipe(duplex=False)
+        self.process = self.ctx.Process(
+            target=_shard_main,
+            args=(self.index, updates_reader, log_writer),
+            name=f'shard-{self.index}'
+        )
+        self.process.start()
+        updates_reader.close()
+        log_writer.close()
+
+        old_conn, self.conn = self.conn, updates_writer
+        if old_conn is not None:
+            old_conn.close()
+        threading.Thread(target=_forward_logs, args=(log_reader,),
+                         name=f'shard-{self.index}-logs', daemon=True).start()
+        self.started = time.monotonic()
+        logger.info(f"Шард {self.index} запущен, pid {self.process.pid}")
+
+    def send(self, data: Optional[dict]):
+        self.pending.put(data)
+
+    def _send_loop(self):
+        while True:
+            data = self.pending.get()
+            while True:
+                try:
+                    self.conn.send(data)
+                    break
+                except (OSError, ValueError):
+                    if data is None:
+                        return
+                    # Шард упал: ждём, пока наблюдатель запустит новый процесс
+                    time.sleep(0.2)
+            if data is None:
+                return
+
+    def check(self, now: float):
+        """Перезапускает упавший процесс с задержкой, растущей при частых падениях"""
+        if self.process.is_alive():
+            return
+
+        if self.restart_at is None:
+            if now - self.started < STABLE_UPTIME:
+                self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+            else:
+                self.backoff = 1.0
+            self.restart_at = now + self.backoff
+            logger.error(
+                f"Шард {self.index} завершился (код {self.process.exitcode}), "
+                f"перезапуск через {self.backoff:g} с"
+            )
+        elif now >= self.restart_at:
+            self.restart_at = None
+            self.start()
+
+    def request_stop(self):
+        """Просит шард обработать принятые обновления и завершиться"""
+        self.send(None)
+
+    def join(self, deadline: float):
+        self.process.join(max(0.0, deadline - time.monotonic()))
+        if self.process.is_alive():
+            logger.warning(f"Шард {self.index} не завершился вовремя, останавливаю принудительно")
+            self.process.kill()
+            self.process.join(1)
+
+
+class Supervisor:
+    """Приём обновлений и распределение их по нескольким процессам бота.
+
+    Супервизор сам получает обновления (polling или webhook) и отправляет
+    каждое в шард user_id % processes, поэтому все обновления пользователя
+    обрабатывает один процесс в исходном порядке. Шарды — полноценные
+    экземпляры бота со своим пулом решателя; общие данные они хранят в
+    SQLite (журнал, статистика, кэш решений) и в каталоге GRAPH_CACHE_DIR,
+    запись в которые безопасна из нескольких процессов. Журнал пишет только
+    супервизор. Упавший шард перезапускается.
+    """
+    def __init__(self, token: str, processes: int):
+        self.token = token
+        self.processes = max(1, processes)
+        self.shards: List[_Shard] = []
+        self._stopping = threading.Event()
+
+    async def _route(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if update.effective_user is not None:
+            key = update.effective_user.id
+        elif update.effective_chat is not None:
+            key = update.effective_chat.id
+        else:
+            key = update.update_id
+        self.shards[key % len(self.shards)].send(update.to_dict())
+
+    def _watch(self):
+        while not self._stopping.wait(1.0):
+            now = time.monotonic()
+            for shard in self.shards:
+                shard.check(now)
+
+    def run(self):
+        """Запускает шарды и принимает обновления до остановки"""
+        from bot_instance import application_builder, serve
+
+        ctx = multiprocessing.get_context('spawn')
+        self.shards = [_Shard(ctx, index) for index in range(self.processes)]
+        watcher = threading.Thread(target=self._watch, name='shard-watcher', daemon=True)
+        watcher.start()
+
+        application = application_builder(self.token).build()
+        application.add_handler(TypeHandler(Update, self._route))
+
+        print(f"🧩 Режим супервизора: {self.processes} процесс(ов) бота")
+        try:
+            serve(application)
+        finally:
+            self._stopping.set()
+            watcher.join()
+            for shard in self.shards:
+                shard.request_stop()
+            deadline = time.monotonic() + STOP_TIMEOUT
+            for shard in self.shards:
+                shard.join(deadline)
+            logger.info("Все шарды остановлены")
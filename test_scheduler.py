@@ -0,0 +1,77 @@
+import asyncio
+
+from scheduler import JobScheduler
+
+
+def test_cancel_during_queue_notification_releases_slot():
+    """Отмена задачи во время уведомления о позиции не должна терять место"""
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        holder_entered = asyncio.Event()
+        holder_release = asyncio.Event()
+        notifying = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(1):
+                holder_entered.set()
+                await holder_release.wait()
+
+        async def on_queued(position):
+            notifying.set()
+            await asyncio.sleep(10)
+
+        async def queued():
+            async with scheduler.slot(2, on_queued):
+                pass
+
+        holder_task = asyncio.create_task(holder())
+        await holder_entered.wait()
+
+        queued_task = asyncio.create_task(queued())
+        await notifying.wait()
+        queued_task.cancel()
+        await asyncio.gather(queued_task, return_exceptions=True)
+        assert scheduler.queued == 0
+
+        holder_release.set()
+        await holder_task
+        assert scheduler.running == 0
+
+        async def later():
+            async with scheduler.slot(3):
+                return True
+
+        assert await asyncio.wait_for(later(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_cancel_while_waiting_after_slot_granted_passes_it_on():
+    """Место, переданное уже отменённой задаче, достаётся следующей в очереди"""
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(1):
+                await release.wait()
+
+        async def waiter(user_id):
+            async with scheduler.slot(user_id):
+                return user_id
+
+        holder_task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        first = asyncio.create_task(waiter(2))
+        second = asyncio.create_task(waiter(3))
+        await asyncio.sleep(0)
+
+        release.set()
+        await holder_task
+        first.cancel()
+        results = await asyncio.gather(first, second, return_exceptions=True)
+
+        assert results[1] == 3
+        assert scheduler.running == 0 and scheduler.queued == 0
+
+    asyncio.run(scenario())